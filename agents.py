@@ -26,6 +26,25 @@ def generate_reply(system_prompt, user_msg, temperature=1.0):
     return completion.choices[0].message.content
 
 
+def generate_reply_stream(system_prompt, user_msg, temperature=1.0):
+    """Yield the reply as text deltas while the provider generates it."""
+    stream = client.chat.completions.create(
+        model="openai/gpt-oss-20b",
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_msg}
+        ],
+        temperature=temperature,
+        max_completion_tokens=1024,
+        top_p=1,
+        stream=True
+    )
+
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
 
 # ------------------------------
 # Persona Functions
@@ -2,216 +2,298 @@
 # agents.py — Persona Engine v2.0
 # ============================================================
 
+import asyncio
+import math
 import os
-from groq import Groq
-
-API_KEY = os.getenv("GROQ_API_KEY")
-if not API_KEY:
-    raise RuntimeError("GROQ_API_KEY not set")
-client = Groq(api_key=API_KEY)
+import threading
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+
+from response_cache import cache_from_env
+from memory_store import GLOBAL_SCOPE, MEMORY_CACHE_SIZE, MEMORY_TOP_K, rank_facts, store_from_env
+from scheduler import scheduler
+from context import count_tokens
+from registry import PersonaRegistry
+from providers import LLM_PROVIDER, Router, parse_routes, register_provider
+from persona_loader import load_personas, validate_persona
+from singleflight import SingleFlight
+from metrics import (
+    PROMPT_BUILD_SECONDS, PROVIDER_ERRORS, PROVIDER_SECONDS, PROVIDER_TTFT_SECONDS, record_usage,
+)
 
 
 # ============================================================
 # BASE LLM CALL
 # ============================================================
 
-def generate_reply(system_prompt, user_msg, temperature=1.0):
-    completion = client.chat.completions.create(
-        model="openai/gpt-oss-20b",
-        messages=[
+MODEL = "openai/gpt-oss-20b"
+MAX_COMPLETION_TOKENS = 1024
+
+# Ordered (provider, model) fallbacks for personas without their own
+# "models", e.g. LLM_ROUTES="groq:openai/gpt-oss-20b,groq:llama-3.1-8b-instant".
+# Clients are only built (and GROQ_API_KEY only required) on the first real call.
+DEFAULT_ROUTES = parse_routes(os.getenv("LLM_ROUTES", f"{LLM_PROVIDER}:{MODEL}"))
+
+
+def _admit_hedge(make_call, request):
+    # A hedged copy is a second provider request: admitted (and charged) like the first, never retried
+    tokens = sum(count_tokens(m["content"]) for m in request["messages"]) + COMPLETION_TOKEN_ESTIMATE
+    return scheduler.run(make_call, tokens=tokens, max_retries=0)
+
+
+router = Router(admit=_admit_hedge)
+
+
+def use_provider(provider, model=MODEL):
+    """Route every persona without its own "models" to `provider` (tests, benchmarks)."""
+    global DEFAULT_ROUTES
+    register_provider(provider.name, provider)
+    DEFAULT_ROUTES = ((provider.name, model),)
+
+# Completion tokens reserved per request in the scheduler's tokens/minute budget
+COMPLETION_TOKEN_ESTIMATE = int(os.getenv("COMPLETION_TOKEN_ESTIMATE", "512"))
+
+# Optional reply cache (RESPONSE_CACHE_BACKEND=memory|sqlite), None when off
+response_cache = cache_from_env()
+
+
+def completion_request(system_prompt, user_msg, temperature=1.0, stream=False):
+    """Keyword arguments shared by every chat.completions.create call (the router sets "model")."""
+    return {
+        "messages": [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_msg}
         ],
-        temperature=temperature,
-        max_completion_tokens=1024,
-        top_p=1,
-        stream=False
+        "temperature": temperature,
+        "max_completion_tokens": MAX_COMPLETION_TOKENS,
+        "top_p": 1,
+        "stream": stream,
+    }
+
+
+def request_tokens(system_prompt, user_msg):
+    """Estimated tokens one request spends against the provider's budget."""
+    return count_tokens(system_prompt) + count_tokens(user_msg) + COMPLETION_TOKEN_ESTIMATE
+
+
+async def _cached_async(system_prompt, user_msg, temperature, use_cache, routes):
+    if response_cache is None or not use_cache:
+        return None
+    return await response_cache.aget(system_prompt, user_msg, temperature, routes[0][1])
+
+
+async def _store_async(system_prompt, user_msg, temperature, use_cache, routes, reply):
+    # Keyed by the primary model even when a fallback answered
+    if response_cache is not None and use_cache:
+        await response_cache.aset(system_prompt, user_msg, temperature, routes[0][1], reply)
+
+
+def _chunk_usage(chunk):
+    # OpenAI-style final chunk carries `usage`; Groq puts it under `x_groq`
+    return getattr(chunk, "usage", None) or getattr(getattr(chunk, "x_groq", None), "usage", None)
+
+
+def generate_reply(system_prompt, user_msg, temperature=1.0, use_cache=True, persona=None, routes=None):
+    """
+    Blocking variant of generate_reply_async, for code outside the event loop.
+    It runs on the scheduler's loop, so it counts against the same rate limits
+    and in-flight cap.
+    """
+    return scheduler.submit(
+        generate_reply_async(system_prompt, user_msg, temperature, use_cache, persona, routes)
     )
 
-    return completion.choices[0].message.content
+
+async def generate_reply_async(system_prompt, user_msg, temperature=1.0, use_cache=True, persona=None, routes=None):
+    """Same as generate_reply, but awaits the provider instead of blocking the event loop."""
+    routes = routes or DEFAULT_ROUTES
+    cached = await _cached_async(system_prompt, user_msg, temperature, use_cache, routes)
+    if cached is not None:
+        return cached
+
+    request = completion_request(system_prompt, user_msg, temperature)
+    start = time.perf_counter()
+    try:
+        completion = await scheduler.run(
+            lambda: router.acreate(routes, **request),
+            tokens=request_tokens(system_prompt, user_msg),
+        )
+    except Exception:
+        PROVIDER_ERRORS.inc(1, persona or "-")
+        raise
+    PROVIDER_SECONDS.observe(time.perf_counter() - start, persona or "-", "async")
+    record_usage(persona, getattr(completion, "usage", None))
+
+    reply = completion.choices[0].message.content
+    await _store_async(system_prompt, user_msg, temperature, use_cache, routes, reply)
+    return reply
+
+
+def _delta_text(chunk):
+    if not chunk.choices:
+        return None
+    return chunk.choices[0].delta.content
+
+
+async def _next_delta(stream):
+    return await stream.__anext__()
+
+
+def generate_reply_stream(system_prompt, user_msg, temperature=1.0, use_cache=True, persona=None, routes=None):
+    """Yield the reply as text deltas while the provider generates it (blocking; see generate_reply)."""
+    stream = generate_reply_stream_async(system_prompt, user_msg, temperature, use_cache, persona, routes)
+    try:
+        while True:
+            try:
+                yield scheduler.submit(_next_delta(stream))
+            except StopAsyncIteration:
+                return
+    finally:
+        scheduler.submit(stream.aclose())
+
+
+async def generate_reply_stream_async(system_prompt, user_msg, temperature=1.0, use_cache=True, persona=None, routes=None):
+    """Async generator variant of generate_reply_stream."""
+    routes = routes or DEFAULT_ROUTES
+    cached = await _cached_async(system_prompt, user_msg, temperature, use_cache, routes)
+    if cached is not None:
+        yield cached
+        return
+
+    label = persona or "-"
+    request = completion_request(system_prompt, user_msg, temperature, stream=True)
+    start = time.perf_counter()
+    try:
+        stream = await scheduler.run(
+            lambda: router.acreate(routes, **request),
+            tokens=request_tokens(system_prompt, user_msg),
+        )
+    except Exception:
+        PROVIDER_ERRORS.inc(1, label)
+        raise
+
+    parts = []
+    try:
+        async for chunk in stream:
+            record_usage(persona, _chunk_usage(chunk))
+            delta = _delta_text(chunk)
+            if delta:
+                if not parts:
+                    PROVIDER_TTFT_SECONDS.observe(time.perf_counter() - start, label)
+                parts.append(delta)
+                yield delta
+    finally:
+        # Frees the scheduler slot even when the reader stops early
+        await stream.aclose()
+    PROVIDER_SECONDS.observe(time.perf_counter() - start, label, "stream")
+    await _store_async(system_prompt, user_msg, temperature, use_cache, routes, "".join(parts))
 
 
 # ============================================================
 # PERSONA ENGINE v2.0
 # ============================================================
 
-# Memory storage: each persona gets a memory list
-PERSONA_MEMORY = {}
+# Memory storage: facts per (persona, scope), where scope is a room id,
+# a user's session id or GLOBAL_SCOPE. MEMORY_BACKEND=sql shares it
+# across workers and restarts.
+memory_store = store_from_env()
+
+# (expires, facts, rendered full suffix) per (persona, scope), least recently
+# used first; dropped whenever remember() changes it or its room/session goes
+# away (forget_scope), and kept no longer than the store's own read cache
+# (MEMORY_CACHE_TTL for sql) so other workers' writes still show up
+_MEMORY_SUFFIX = OrderedDict()
+_memory_lock = threading.Lock()
 
-def remember(persona_name, fact):
+def remember(persona_name, fact, scope=GLOBAL_SCOPE):
     """Store a memory item for a persona."""
-    if persona_name not in PERSONA_MEMORY:
-        PERSONA_MEMORY[persona_name] = []
-    if len(PERSONA_MEMORY[persona_name]) > 20:
-        PERSONA_MEMORY[persona_name].pop(0)
-    PERSONA_MEMORY[persona_name].append(fact)
+    memory_store.remember(persona_name, scope, fact)
+    with _memory_lock:
+        _MEMORY_SUFFIX.pop((persona_name, scope), None)
+
+
+def forget_scope(scope):
+    """Drop cached memory for a room or session that has closed; stored facts are kept."""
+    with _memory_lock:
+        for key in [key for key in _MEMORY_SUFFIX if key[1] == scope]:
+            del _MEMORY_SUFFIX[key]
+    memory_store.drop_cached(scope)
 
 
-def inject_memory(persona_name):
-    """Inject persona memory into prompt."""
-    mem = PERSONA_MEMORY.get(persona_name, [])
-    if not mem:
+def _render_memory(facts):
+    if not facts:
         return ""
-    return "\nRelevant Memory:\n" + "\n".join(f"- {m}" for m in mem) + "\n"
+    return "\nRelevant Memory:\n" + "\n".join(f"- {m}" for m in facts) + "\n"
+
+
+def _memory_entry(key):
+    with _memory_lock:
+        entry = _MEMORY_SUFFIX.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        _MEMORY_SUFFIX.move_to_end(key)
+        return entry
+
+
+def _cache_memory(key, facts):
+    ttl = getattr(memory_store, "cache_ttl", None)
+    expires = math.inf if ttl is None else time.monotonic() + ttl
+    entry = (expires, facts, _render_memory(facts))
+    if facts:  # most sessions have no memory; they get no entry
+        with _memory_lock:
+            _MEMORY_SUFFIX[key] = entry
+            _MEMORY_SUFFIX.move_to_end(key)
+            while len(_MEMORY_SUFFIX) > MEMORY_CACHE_SIZE:
+                _MEMORY_SUFFIX.popitem(last=False)
+    return entry
+
+
+def _select_memory(entry, query):
+    # Up to MEMORY_TOP_K facts all make the cut, so ranking would change nothing
+    _, facts, suffix = entry
+    if query is None or len(facts) <= MEMORY_TOP_K:
+        return suffix
+    return _render_memory(rank_facts(facts, query))
+
+
+def inject_memory(persona_name, scope=GLOBAL_SCOPE, query=None):
+    """
+    Inject persona memory into prompt: all facts, or only the top-k most
+    relevant to `query` when one is given.
+    """
+    key = (persona_name, scope)
+    entry = _memory_entry(key) or _cache_memory(key, memory_store.facts(persona_name, scope))
+    return _select_memory(entry, query)
+
+
+async def inject_memory_async(persona_name, scope=GLOBAL_SCOPE, query=None):
+    """inject_memory for the event loop: a cache miss on a blocking store (sql) is read in a thread."""
+    key = (persona_name, scope)
+    entry = _memory_entry(key)
+    if entry is None:
+        if memory_store.blocking:
+            facts = await asyncio.to_thread(memory_store.facts, persona_name, scope)
+        else:
+            facts = memory_store.facts(persona_name, scope)
+        entry = _cache_memory(key, facts)
+    return _select_memory(entry, query)
 
 
 # ============================================================
 # PERSONA DEFINITIONS
 # ============================================================
 
-PERSONAS = {
-    "base": {
-        "role": "General AI Assistant",
-        "traits": ["helpful", "clear", "neutral", "concise"],
-        "tone": {"professionalism": 3, "humor": 1, "energy": 2, "complexity": 2},
-        "style": {"examples": False, "bullets": False, "code": False, "metaphors": False},
-        "rules": [
-            "Avoid hashtags.",
-            "Give short, clear answers.",
-        ]
-    },
-
-    "CoderAI": {
-        "role": "Senior Software Engineer",
-        "traits": ["logical", "precise", "teaches with examples"],
-        "tone": {"professionalism": 5, "humor": 1, "energy": 2, "complexity": 3},
-        "style": {"examples": True, "bullets": True, "code": True, "metaphors": False},
-        "rules": [
-            "Avoid hashtags.",
-            "Use best practices.",
-            "Explain reasoning simply.",
-        ]
-    },
-
-    "PhilosopherAI": {
-        "role": "Philosophical Thinker",
-        "traits": ["reflective", "abstract", "deeply analytical"],
-        "tone": {"professionalism": 4, "humor": 1, "energy": 3, "complexity": 4},
-        "style": {"examples": False, "bullets": False, "code": False, "metaphors": True},
-        "rules": [
-            "Avoid hashtags.",
-            "Pose thoughtful questions.",
-        ]
-    },
-
-    "JokerAI": {
-        "role": "Playful Humorist",
-        "traits": ["funny", "witty", "light-hearted"],
-        "tone": {"professionalism": 1, "humor": 5, "energy": 4, "complexity": 2},
-        "style": {"examples": False, "bullets": False, "code": False, "metaphors": False},
-        "rules": [
-            "Avoid offensive jokes.",
-            "Humor must not replace the answer.",
-        ]
-    },
-
-    "ScientistAI": {
-        "role": "Evidence-Based Scientist",
-        "traits": ["analytical", "structured", "factual"],
-        "tone": {"professionalism": 5, "humor": 1, "energy": 2, "complexity": 3},
-        "style": {"examples": True, "bullets": True, "code": False, "metaphors": False},
-        "rules": [
-            "Avoid speculation.",
-            "Avoid hashtags.",
-        ]
-    },
-
-    "LawyerAI": {
-        "role": "Logical Legal Thinker",
-        "traits": ["structured", "balanced", "argumentative"],
-        "tone": {"professionalism": 5, "humor": 1, "energy": 2, "complexity": 3},
-        "style": {"examples": False, "bullets": True, "code": False, "metaphors": False},
-        "rules": [
-            "Avoid actual legal advice.",
-            "Present claims and counterclaims clearly."
-        ]
-    },
-
-    "TeacherAI": {
-        "role": "Kind, Patient Teacher",
-        "traits": ["gentle", "simple explanations", "encouraging"],
-        "tone": {"professionalism": 4, "humor": 2, "energy": 3, "complexity": 1},
-        "style": {"examples": True, "bullets": False, "code": False, "metaphors": True},
-        "rules": [
-            "Use analogies when helpful.",
-            "Keep explanations beginner-friendly.",
-        ]
-    },
-
-    "PoetAI": {
-        "role": "Emotional Poet",
-        "traits": ["lyrical", "expressive", "imagery-rich"],
-        "tone": {"professionalism": 2, "humor": 1, "energy": 3, "complexity": 4},
-        "style": {"examples": False, "bullets": False, "code": False, "metaphors": True},
-        "rules": [
-            "Write poetically but clearly.",
-            "Blend meaning with beauty.",
-        ]
-    },
-
-    "VillainAI": {
-        "role": "Cartoon Supervillain",
-        "traits": ["dramatic", "theatrical", "exaggerated"],
-        "tone": {"professionalism": 1, "humor": 3, "energy": 5, "complexity": 2},
-        "style": {"examples": False, "bullets": False, "code": False, "metaphors": True},
-        "rules": [
-            "Never promote real harm.",
-            "Stay fictional and comedic.",
-        ]
-    },
-
-    "HistorianAI": {
-        "role": "Historical Expert",
-        "traits": ["detailed", "accurate", "contextual"],
-        "tone": {"professionalism": 5, "humor": 1, "energy": 2, "complexity": 3},
-        "style": {"examples": False, "bullets": True, "code": False, "metaphors": False},
-        "rules": [
-            "Avoid inaccuracies.",
-            "Provide historical context.",
-        ]
-    },
-
-    "DoctorAI": {
-        "role": "Responsible Medical Explainer",
-        "traits": ["calm", "rational", "reassuring"],
-        "tone": {"professionalism": 5, "humor": 1, "energy": 2, "complexity": 2},
-        "style": {"examples": True, "bullets": True, "code": False, "metaphors": False},
-        "rules": [
-            "No medical diagnoses.",
-            "Give general advice only.",
-        ]
-    },
-
-    "ComedianAI": {
-        "role": "Witty Stand-Up Comedian",
-        "traits": ["funny", "clever", "observational"],
-        "tone": {"professionalism": 1, "humor": 5, "energy": 4, "complexity": 2},
-        "style": {"examples": False, "bullets": False, "code": False, "metaphors": False},
-        "rules": [
-            "No offensive jokes.",
-            "Blend humor with helpfulness.",
-        ]
-    },
-
-    "AnimeAI": {
-        "role": "Anime Protagonist",
-        "traits": ["energetic", "dramatic", "inspiring"],
-        "tone": {"professionalism": 1, "humor": 2, "energy": 5, "complexity": 2},
-        "style": {"examples": False, "bullets": False, "code": False, "metaphors": True},
-        "rules": [
-            "Avoid violent anime tropes.",
-            "Be dramatic but kind.",
-        ]
-    },
-}
+# Loaded from PERSONA_DIR (./personas/*.json|yaml) and validated once at import
+PERSONAS = load_personas()
 
 
 # ============================================================
 # SYSTEM PROMPT GENERATOR
 # ============================================================
 
-def build_system_prompt(name):
-    p = PERSONAS[name]
+def compile_persona_prompt(name, p):
+    """Render the static part of a persona's system prompt."""
 
     traits = ", ".join(p["traits"])
 
@@ -251,21 +333,120 @@ Your behavior:
 - Avoid using hashtags.
 """
 
+    return base_prompt
+
+
+# Persona prompts are compiled once; only the memory suffix varies per call
+_COMPILED_PROMPTS = {name: compile_persona_prompt(name, p) for name, p in PERSONAS.items()}
+COMPILED_PROMPTS = MappingProxyType(_COMPILED_PROMPTS)
+
+# Per-persona (provider, model) fallbacks from their "models" field
+_PERSONA_ROUTES = {name: parse_routes(p["models"]) for name, p in PERSONAS.items() if p.get("models")}
+
+# What users type ("coder", "CoderAI", "sci") -> persona name
+persona_registry = PersonaRegistry()
+for _name, _persona in PERSONAS.items():
+    persona_registry.register(_name, _persona.get("aliases", ()))
+
+
+def register_persona(name, persona, aliases=()):
+    """Validate, add or replace a persona, compile its prompt and make it addressable."""
+    persona = validate_persona(name, persona)
+    is_new = name not in PERSONAS
+    PERSONAS[name] = persona
+    _COMPILED_PROMPTS[name] = compile_persona_prompt(name, persona)
+    if persona.get("models"):
+        _PERSONA_ROUTES[name] = parse_routes(persona["models"])
+    else:
+        _PERSONA_ROUTES.pop(name, None)
+    persona_registry.register(name, tuple(persona.get("aliases", ())) + tuple(aliases))
+    if is_new:
+        AGENTS.append(_agent_entry(name))
+
+
+_prompt_build_seconds = PROMPT_BUILD_SECONDS.labels()
+
+
+def build_system_prompt(name, scope=GLOBAL_SCOPE, query=None):
+    start = time.perf_counter()
     # Add memory if available
-    memory_prompt = inject_memory(name)
+    prompt = _COMPILED_PROMPTS[name] + inject_memory(name, scope, query)
+    _prompt_build_seconds.observe(time.perf_counter() - start)
+    return prompt
+
 
-    return base_prompt + memory_prompt
+async def build_system_prompt_async(name, scope=GLOBAL_SCOPE, query=None):
+    start = time.perf_counter()
+    prompt = _COMPILED_PROMPTS[name] + await inject_memory_async(name, scope, query)
+    _prompt_build_seconds.observe(time.perf_counter() - start)
+    return prompt
 
 
 # ============================================================
 # PUBLIC PERSONA CALL FUNCTIONS (BACKWARD COMPATIBLE)
 # ============================================================
 
-def call_persona(name, message):
-    system_prompt = build_system_prompt(name)
-    return generate_reply(system_prompt, message)
+def persona_cacheable(name):
+    """Personas opt out of the response cache with "cache": False."""
+    return PERSONAS[name].get("cache", True)
+
+
+def persona_routes(name):
+    """A persona's own "models" fallback list, else DEFAULT_ROUTES."""
+    return _PERSONA_ROUTES.get(name) or DEFAULT_ROUTES
+
+
+def call_persona(name, message, scope=GLOBAL_SCOPE):
+    system_prompt = build_system_prompt(name, scope, query=message)
+    return generate_reply(
+        system_prompt, message, use_cache=persona_cacheable(name), persona=name, routes=persona_routes(name)
+    )
+
+
+# Identical concurrent requests (same persona, prompt and message) share one
+# provider call; personas with "cache": False always get their own.
+inflight = SingleFlight()
 
 
+async def call_persona_async(name, message, scope=GLOBAL_SCOPE):
+    system_prompt = await build_system_prompt_async(name, scope, query=message)
+    cacheable = persona_cacheable(name)
+
+    def call():
+        return generate_reply_async(
+            system_prompt, message, use_cache=cacheable, persona=name, routes=persona_routes(name)
+        )
+
+    if not cacheable:
+        return await call()
+    return await inflight.do((name, system_prompt, message), call)
+
+
+def call_persona_stream(name, message, scope=GLOBAL_SCOPE):
+    system_prompt = build_system_prompt(name, scope, query=message)
+    return generate_reply_stream(
+        system_prompt, message, use_cache=persona_cacheable(name), persona=name, routes=persona_routes(name)
+    )
+
+
+async def call_persona_stream_async(name, message, scope=GLOBAL_SCOPE):
+    system_prompt = await build_system_prompt_async(name, scope, query=message)
+    cacheable = persona_cacheable(name)
+
+    def call():
+        return generate_reply_stream_async(
+            system_prompt, message, use_cache=cacheable, persona=name, routes=persona_routes(name)
+        )
+
+    stream = inflight.stream((name, system_prompt, message), call) if cacheable else call()
+    try:
+        async for delta in stream:
+            yield delta
+    finally:
+        await stream.aclose()
+
+
+# One-argument helpers per persona, as before personas moved to files
 def base(user_msg): return call_persona("base", user_msg)
 def coder(user_msg): return call_persona("CoderAI", user_msg)
 def philosopher(user_msg): return call_persona("PhilosopherAI", user_msg)
@@ -281,23 +462,12 @@ def comedian(user_msg): return call_persona("ComedianAI", user_msg)
 def anime(user_msg): return call_persona("AnimeAI", user_msg)
 
 
+def _agent_entry(name):
+    return {"name": name, "func": lambda user_msg: call_persona(name, user_msg)}
+
+
 # ============================================================
 # AGENT LIST TO MATCH YOUR EXISTING BACKEND
 # ============================================================
 
-AGENTS = [
-    {"name": "base", "func": base},
-    {"name": "CoderAI", "func": coder},
-    {"name": "PhilosopherAI", "func": philosopher},
-    {"name": "JokerAI", "func": joker},
-    {"name": "ScientistAI", "func": scientist},
-    {"name": "LawyerAI", "func": lawyer},
-    {"name": "TeacherAI", "func": teacher},
-    {"name": "PoetAI", "func": poet},
-    {"name": "VillainAI", "func": villain},
-    {"name": "HistorianAI", "func": historian},
-    {"name": "DoctorAI", "func": doctor},
-    {"name": "ComedianAI", "func": comedian},
-    {"name": "AnimeAI", "func": anime},
-]
-
+AGENTS = [_agent_entry(name) for name in PERSONAS]
@@ -1,43 +1,67 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse
-from sqlalchemy.orm import Session
-from pathlib import Path
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from contextlib import asynccontextmanager
 from typing import Dict
-import json
 import asyncio
+import os
 import uuid
 
 from models import ChatLog, ChatroomLog
-from database import SessionLocal
-from agents2 import AGENTS
+from logger import log_writer
+from database import session_scope
+from history import room_history
+from static import StaticAssets
+from transcripts import in_thread, iter_transcript, ndjson_line, paced, to_binary, to_ndjson
+import metrics
+from agents2 import (
+    call_persona_async, call_persona_stream_async, forget_scope, inflight, persona_registry, response_cache, router,
+)
+from orchestrator import Orchestrator, debate_prompt
+from rooms import Room, RoomRegistry
+from context import RoomContext
+from scheduler import BACKGROUND, DIRECT, request_context, scheduler
+from broadcast import Broadcaster, negotiate
+from bus import bus_from_env
 
 
 # ------------------------ FASTAPI APP ------------------------
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    log_writer.start()
+    await manager.bus.start()
+    yield
+    await manager.bus.stop()
+    await log_writer.stop()  # flush queued log rows before exit
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Stream replies as start/delta/end frames instead of one finished message
+STREAM_REPLIES = os.getenv("AGORA_STREAM_REPLIES", "1") != "0"
+
+# Chatroom messages waiting for their room's reply worker; beyond this they are refused
+ROOM_INBOX_SIZE = int(os.getenv("ROOM_INBOX_SIZE", "16"))
 
 
 # ------------------------ DB LOGGING ------------------------
-def log_chat(db: Session, role: str, content: str, ai_name: str | None = None):
-    row = ChatLog(role=role, content=content, ai_name=ai_name)
-    db.add(row)
-    db.commit()
+# Rows are queued for the background LogWriter, which group-commits them.
+async def log_chat(role: str, content: str, ai_name: str | None = None, session_id: str | None = None):
+    await log_writer.write(ChatLog, session_id=session_id, role=role, content=content, ai_name=ai_name)
 
 
-def log_chatroom(
-    db: Session,
+async def log_chatroom(
     role: str,
     chatroom_id: str,
     message: str,
     ai_name: str | None = None
 ):
-    row = ChatroomLog(
+    await log_writer.write(
+        ChatroomLog,
         role=role,
         chatroom_id=chatroom_id,
         message=message,
         ai_name=ai_name
     )
-    db.add(row)
-    db.commit()
 
 
 # ------------------------ ROUTES ------------------------
@@ -46,181 +70,546 @@ async def read_root():
     return {"message": "server is running!"}
 
 
+# Frontend files, read and compressed once at import
+assets = StaticAssets()
+
+
 @app.get("/chat")
-def chat_page():
-    html = Path("app/front.html").read_text()
-    return HTMLResponse(html)
+def chat_page(request: Request):
+    return assets.response(request, "front.html")
+
+
+@app.get("/static/{name}")
+def static_file(request: Request, name: str):
+    """style.css / script.js; fingerprinted names (as linked from /chat) are cached for a year."""
+    response = assets.response(request, name)
+    if response is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    return response
+
+
+@app.get("/metrics")
+async def metrics_page():
+    """Prometheus text exposition of hot-path timings, queue depths and token usage."""
+    # Rendered on the event loop, which owns the room and outbox dicts it reads
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/rooms/{chatroom_id}/history")
+def chatroom_history(chatroom_id: str, limit: int = 50, before: str | None = None):
+    """Newest page of a room's messages; pass `next_cursor` as `before` for older ones."""
+    try:
+        with session_scope() as db:
+            return room_history(db, chatroom_id, limit=limit, before=before)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+def transcript_rows(chatroom_id: str):
+    with session_scope() as db:
+        yield from iter_transcript(db, chatroom_id)
+
+
+@app.get("/rooms/{chatroom_id}/export")
+def export_transcript(chatroom_id: str, format: str = "ndjson"):
+    """The room's whole transcript, streamed from the DB: NDJSON, or gzip'd columnar binary."""
+    if format == "ndjson":
+        body, media_type, filename = to_ndjson(transcript_rows(chatroom_id)), "application/x-ndjson", f"{chatroom_id}.ndjson"
+    elif format == "binary":
+        body, media_type, filename = to_binary(transcript_rows(chatroom_id), chatroom_id), "application/gzip", f"{chatroom_id}.agtx.gz"
+    else:
+        raise HTTPException(status_code=400, detail="format must be ndjson or binary")
+    return StreamingResponse(
+        body, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@app.get("/rooms/{chatroom_id}/replay")
+async def replay_transcript(chatroom_id: str, speed: float = 1.0):
+    """NDJSON of the room's transcript at its recorded pace (`speed` x faster; 0 = no waiting)."""
+    async def body():
+        async for record in paced(in_thread(transcript_rows(chatroom_id)), speed):
+            yield ndjson_line(record)
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
 
 
 # ------------------------ CONNECTION MANAGER ------------------------
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: list[WebSocket] = []
-        self.chatroom: Dict | None = None  # holds active chatroom state
+    """
+    Local sockets and rooms for this worker. Room broadcasts and room
+    state go through the bus, so members connected to other workers (or
+    other hosts) see the same rooms.
+
+    Bus state per room: room:<id> (its agents), turn:<id> (turn counter)
+    and hosts:<id> (workers with members in it). The last worker whose
+    copy of the room empties deletes all three.
+    """
+
+    def __init__(self, bus=None):
+        self.rooms = RoomRegistry(on_close=self.room_closed)  # every socket is in exactly one room (lobby by default)
+        self._releasing = set()  # keeps release_room tasks alive
+        self.broadcaster = Broadcaster(on_close=self.disconnect)
+        self.bus = bus or bus_from_env()
+        self.bus.on_message = self.deliver
 
     async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        print("NEW client connected. Total:", len(self.active_connections))
+        subprotocol, binary = negotiate(websocket.scope)
+        await websocket.accept(subprotocol=subprotocol)
+        self.rooms.join(websocket, self.rooms.lobby)
+        self.broadcaster.register(websocket, binary)
+        print("NEW client connected. Total:", self.rooms.connections)
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-        print("Client DISCONNECTED. Remaining:", len(self.active_connections))
-
-    async def broadcast(self, message: Dict):
-        for connection in self.active_connections:
-            await connection.send_text(json.dumps(message))
+        if websocket not in self.rooms:
+            return  # already disconnected (e.g. dropped as a slow consumer)
+        self.rooms.leave(websocket)
+        self.broadcaster.unregister(websocket)
+        print("Client DISCONNECTED. Remaining:", self.rooms.connections)
+
+    def room_of(self, websocket: WebSocket) -> Room:
+        return self.rooms.room_of(websocket)
+
+    async def broadcast(self, room: Room, message: Dict):
+        await self.bus.publish(room.id, message)
+
+    def deliver(self, room_id: str, message: Dict, remote: bool):
+        """Bus callback: hand a room message to this worker's members of that room."""
+        room = self.rooms.get(room_id)
+        if room is None:
+            return
+
+        if "turn" in message:
+            # Context update from the worker that ran the turn; ours is already applied
+            if remote:
+                room.context.add(*message["turn"])
+            return
+
+        # Encoded once and queued per socket; never waits on a slow client
+        self.broadcaster.publish(room.members, message)
+
+    async def create_room(self, agents) -> Room:
+        room = self.rooms.create(agents)
+        await self.bus.set(f"room:{room.id}", {"agents": list(room.agents)})
+        await self.bus.incr(f"hosts:{room.id}")
+        return room
+
+    async def find_room(self, room_id: str) -> Room | None:
+        room = self.rooms.get(room_id)
+        if room is not None:
+            return room
+        state = await self.bus.get(f"room:{room_id}")
+        if not state:
+            return None
+        room = self.rooms.get(room_id)  # may have been adopted while we waited
+        if room is None:
+            room = self.rooms.adopt(room_id, state["agents"])
+            await self.bus.incr(f"hosts:{room_id}")
+        return room
+
+    def room_closed(self, room: Room):
+        """RoomRegistry callback (sync, from disconnect): drop cached memory, release bus state in the background."""
+        forget_scope(room.id)
+        task = asyncio.get_running_loop().create_task(self.release_room(room.id))
+        self._releasing.add(task)
+        task.add_done_callback(self._releasing.discard)
+
+    async def release_room(self, room_id: str):
+        try:
+            if await self.bus.incr(f"hosts:{room_id}", -1) <= 1:
+                await self.bus.delete(f"room:{room_id}", f"turn:{room_id}", f"hosts:{room_id}")
+        except ConnectionError as exc:
+            print("Could not release room", room_id, "on the bus:", exc)
+
+    async def next_agent(self, room: Room) -> str:
+        return room.agent_for_turn(await self.bus.incr(f"turn:{room.id}"))
+
+    async def add_turn(self, room: Room, author: str, text: str):
+        """Append to the room's context here and on every other worker hosting it."""
+        room.context.add(author, text)
+        await self.bus.publish(room.id, {"turn": [author, text]})
+
+    async def send(self, websocket: WebSocket, message: Dict):
+        self.broadcaster.send(websocket, message)
+
+    async def send_wait(self, websocket: WebSocket, message: Dict):
+        await self.broadcaster.send_wait(websocket, message)
 
 
 manager = ConnectionManager()
+orchestrator = Orchestrator()
+
+# Read at scrape time; `manager` is looked up then so a replaced manager is still reported
+metrics.register_stats("agora_log_writer", log_writer.stats)
+metrics.register_stats("agora_broadcast", lambda: manager.broadcaster.stats())
+metrics.register_stats("agora_scheduler", scheduler.stats)
+metrics.register_stats("agora_router", router.stats)
+metrics.register_stats("agora_singleflight", inflight.stats)
+metrics.register_stats("agora_static", assets.stats)
+metrics.register_stats("agora_rooms", lambda: {"count": len(manager.rooms), "connections": manager.rooms.connections})
+if response_cache is not None:
+    metrics.register_stats("agora_response_cache", response_cache.stats)
+
+
+# ------------------------ REPLIES ------------------------
+async def send_reply(room: Room, author: str, persona: str, message: str, scope: str | None = None) -> str:
+    """
+    Generate `persona`'s reply to `message` and broadcast it to `room` as `author`.
+
+    In streaming mode the reply goes out as frames sharing one id:
+      {"type": "start", "id", "author"}
+      {"type": "delta", "id", "content"}   (one per chunk)
+      {"type": "end",   "id", "author", "content"}   (assembled text)
+
+    If the reply is cancelled mid-stream, the "end" frame still goes out
+    with what was generated so far and "stopped": true.
+
+    Persona memory is looked up under `scope` (default: the room id), which
+    is also the fairness key for the provider scheduler.
+    Returns the assembled text, which is what gets logged.
+    """
+    scope = scope or room.id
+    with request_context(DIRECT, scope):
+        if not STREAM_REPLIES:
+            reply = await call_persona_async(persona, message, scope)
+            await manager.broadcast(room, {"author": author, "content": reply})
+            return reply
+
+        msg_id = uuid.uuid4().hex
+        await manager.broadcast(room, {"type": "start", "id": msg_id, "author": author})
+
+        parts = []
+        try:
+            async for delta in call_persona_stream_async(persona, message, scope):
+                parts.append(delta)
+                await manager.broadcast(room, {"type": "delta", "id": msg_id, "content": delta})
+        except asyncio.CancelledError:
+            await manager.broadcast(room, {
+                "type": "end", "id": msg_id, "author": author, "content": "".join(parts), "stopped": True
+            })
+            raise
+
+        reply = "".join(parts)
+        await manager.broadcast(room, {"type": "end", "id": msg_id, "author": author, "content": reply})
+        return reply
+
+
+# ------------------------ DEBATE ------------------------
+MAX_DEBATE_ROUNDS = 10
+
+
+def parse_debate_command(user_msg: str):
+    """
+    Parse `/debate <agents> | <topic> | <rounds>` into (agent names, topic, rounds).
+    Returns None if no agent matches or the topic is missing.
+    """
+    fields = [f.strip() for f in user_msg[len("/debate"):].split("|")]
+    if len(fields) < 2 or not fields[1]:
+        return None
+
+    names, topic = fields[0].split(), fields[1]
+    try:
+        rounds = int(fields[2]) if len(fields) > 2 else 1
+    except ValueError:
+        rounds = 1
+    rounds = max(1, min(rounds, MAX_DEBATE_ROUNDS))
+
+    selected = persona_registry.resolve_many(names)
+    if not selected:
+        return None
+    return selected, topic, rounds
+
+
+async def run_debate(room: Room, agents: list[str], topic: str, rounds: int):
+    chatroom_id = str(uuid.uuid4())
+    await log_chatroom(role="user", chatroom_id=chatroom_id, message=topic)
+
+    await manager.broadcast(room, {
+        "author": "System",
+        "content": f"Debate on \"{topic}\" with: {', '.join(agents)}"
+    })
+
+    # Bounded transcript: older rounds are folded into a summary
+    context = RoomContext()
+    for round_no in range(1, rounds + 1):
+        await manager.broadcast(room, {"author": "System", "content": f"Round {round_no} of {rounds}"})
+
+        transcript = context.render()
+        turns = [
+            (agent, debate_prompt(agent, topic, round_no, rounds, transcript))
+            for agent in agents
+        ]
+
+        # Debate turns yield to users waiting on direct replies
+        with request_context(BACKGROUND, room.id):
+            async for result in orchestrator.fan_out(turns):
+                if result.reply is None:
+                    await manager.broadcast(room, {
+                        "author": "System",
+                        "content": f"{result.agent} skipped this round: {result.error}"
+                    })
+                    continue
+
+                await log_chatroom(
+                    role="ai",
+                    chatroom_id=chatroom_id,
+                    message=result.reply,
+                    ai_name=result.agent
+                )
+                await manager.broadcast(room, {"author": result.agent, "content": result.reply})
+                context.add(result.agent, result.reply)
+
+    await manager.broadcast(room, {"author": "System", "content": "Debate finished."})
+
+
+# ------------------------ CHATROOM WORKER ------------------------
+def submit_chatroom_message(room: Room, user_msg: str) -> bool:
+    """Queue a message for the room's reply worker; False when the inbox is full."""
+    if room.worker is None:
+        room.inbox = asyncio.Queue(maxsize=ROOM_INBOX_SIZE)
+        room.worker = asyncio.create_task(chatroom_worker(room))
+    try:
+        room.inbox.put_nowait(user_msg)
+        return True
+    except asyncio.QueueFull:
+        return False
+
+
+async def chatroom_worker(room: Room):
+    """One reply at a time, in arrival order; cancelled with the room (Room.close)."""
+    while True:
+        user_msg = await room.inbox.get()
+        room.current = asyncio.create_task(chatroom_turn(room, user_msg))
+        try:
+            await room.current
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                raise
+            # only this reply was stopped; carry on with the next message
+        except Exception as exc:
+            print("Chatroom reply failed:", exc)
+        finally:
+            room.current = None
+
+
+async def chatroom_turn(room: Room, user_msg: str):
+    await log_chatroom(
+        role="user",
+        chatroom_id=room.id,
+        message=user_msg
+    )
+
+    agent_name = await manager.next_agent(room)
+
+    history = room.context.render() or "Start conversation"
+    prompt = (
+        f"{history}\n\n"
+        f"User said: {user_msg}\n\n"
+        f"You are {agent_name}. Reply naturally and keep the conversation moving."
+    )
+
+    reply = await send_reply(room, agent_name, agent_name, prompt)
+
+    await log_chatroom(
+        role="ai",
+        chatroom_id=room.id,
+        message=reply,
+        ai_name=agent_name
+    )
+
+    await manager.add_turn(room, "User", user_msg)
+    await manager.add_turn(room, agent_name, reply)
+
+
+# ------------------------ GENERATION ------------------------
+async def generate(websocket: WebSocket, room: Room, session_id: str, user_msg: str):
+    """A socket's debate, direct chat or BASE reply; runs as a task so it can be cancelled."""
+    try:
+        # -----------------------------------------------------------
+        # DEBATE
+        # -----------------------------------------------------------
+        if user_msg.startswith("/debate"):
+            debate = parse_debate_command(user_msg)
+            if not debate:
+                await manager.broadcast(room, {
+                    "author": "System",
+                    "content": "Usage: /debate CoderAI PoetAI | topic | rounds"
+                })
+                return
+
+            await run_debate(room, *debate)
+            return
+
+        # -----------------------------------------------------------
+        # REPLAY (to this socket only)
+        # -----------------------------------------------------------
+        if user_msg.startswith("/replay"):
+            await replay_to(websocket, user_msg)
+            return
+
+        # -----------------------------------------------------------
+        # DIRECT AGENT CHAT
+        # -----------------------------------------------------------
+        direct = persona_registry.match_command(user_msg)
+        if direct:
+            selected, cleaned = direct
+            reply = await send_reply(room, selected, selected, cleaned, scope=session_id)
+
+            await log_chat(
+                role="ai",
+                content=reply,
+                ai_name=selected,
+                session_id=session_id
+            )
+            return
+
+        # -----------------------------------------------------------
+        # BASE FALLBACK
+        # -----------------------------------------------------------
+        reply = await send_reply(room, "BASE", "base", user_msg, scope=session_id)
+
+        await log_chat(
+            role="ai",
+            content=reply,
+            ai_name="Base",
+            session_id=session_id
+        )
+    except Exception as exc:
+        print("Reply failed:", exc)
+        await manager.send(websocket, {"author": "System", "content": "Sorry, that reply failed."})
+
+
+async def replay_to(websocket: WebSocket, user_msg: str):
+    """/replay <chatroom id> [speed]: resend a stored transcript at its recorded pace."""
+    parts = user_msg.split()
+    try:
+        chatroom_id, speed = parts[1], float(parts[2]) if len(parts) > 2 else 1.0
+    except (IndexError, ValueError):
+        await manager.send(websocket, {"author": "System", "content": "Usage: /replay <chatroom id> [speed]"})
+        return
+
+    await manager.send(websocket, {"author": "System", "content": f"Replaying {chatroom_id} at {speed:g}x..."})
+    count = 0
+    async for record in paced(in_thread(transcript_rows(chatroom_id)), speed):
+        await manager.send_wait(websocket, {"author": record["author"], "content": record["content"], "replay": True})
+        count += 1
+    await manager.send(websocket, {"author": "System", "content": f"Replay finished ({count} messages)."})
+
+
+def cancel(task: asyncio.Task | None) -> bool:
+    if task is None or task.done():
+        return False
+    task.cancel()
+    return True
 
 
 # ------------------------ WEBSOCKET ------------------------
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
-    db = SessionLocal()
+    session_id = uuid.uuid4().hex
+    # This socket's reply/debate in progress. A new message supersedes it, and
+    # /stop or a disconnect cancels it, which also cancels the provider call.
+    generation = None
 
     try:
         while True:
             user_msg = await websocket.receive_text()
+            room = manager.room_of(websocket)
 
             # Always show what user typed
-            await manager.broadcast({"author": "User", "content": user_msg})
-            log_chat(db=db, role="user", content=user_msg)
+            await manager.broadcast(room, {"author": "User", "content": user_msg})
+            await log_chat(role="user", content=user_msg, session_id=session_id)
 
             # -----------------------------------------------------------
-            # CHATROOM CREATE
+            # STOP
             # -----------------------------------------------------------
-            if user_msg.startswith("/chatroom"):
-                parts = user_msg.split()[1:]
-                selected_agents = []
+            if user_msg.startswith("/stop"):
+                stopped = cancel(generation)
+                if room.is_chatroom:
+                    stopped = cancel(room.current) or stopped
+                await manager.send(websocket, {
+                    "author": "System",
+                    "content": "Stopped." if stopped else "Nothing to stop."
+                })
+                continue
 
-                for part in parts:
-                    for agent in AGENTS:
-                        if part.lower() in agent["name"].lower():
-                            selected_agents.append(agent)
+            # -----------------------------------------------------------
+            # JOIN / LEAVE CHATROOM
+            # -----------------------------------------------------------
+            if user_msg.startswith("/join"):
+                parts = user_msg.split()
+                target = await manager.find_room(parts[1]) if len(parts) > 1 else None
 
-                if not selected_agents:
-                    await manager.broadcast({
+                if target is None:
+                    await manager.broadcast(room, {
                         "author": "System",
-                        "content": "No agents found! Example: /chatroom scientist poet"
+                        "content": "No such chatroom! Example: /join <chatroom id>"
                     })
                     continue
 
-                chatroom_id = str(uuid.uuid4())
-
-                manager.chatroom = {
-                    "id": chatroom_id,
-                    "agents": selected_agents,
-                    "last_message": "Start conversation",
-                    "agent_index": 0
-                }
-
-                await manager.broadcast({
+                manager.rooms.join(websocket, target)
+                await manager.broadcast(target, {
                     "author": "System",
-                    "content": f"Chatroom created with: {', '.join(a['name'] for a in selected_agents)}"
+                    "content": f"A user joined the chatroom with: {', '.join(target.agents)}"
                 })
+                continue
 
-                await manager.broadcast({
+            if user_msg.startswith("/leave"):
+                manager.rooms.join(websocket, manager.rooms.lobby)
+                await manager.send(websocket, {
                     "author": "System",
-                    "content": "Chatroom started. Agents are waiting for you to speak..."
+                    "content": "Left the chatroom."
                 })
                 continue
 
             # -----------------------------------------------------------
-            # CHATROOM MESSAGE HANDLING
+            # CHATROOM CREATE
             # -----------------------------------------------------------
-            if manager.chatroom:
-                chatroom = manager.chatroom
-                chatroom_id = chatroom["id"]
-
-                log_chatroom(
-                    db=db,
-                    role="user",
-                    chatroom_id=chatroom_id,
-                    message=user_msg
-                )
-
-                agent = chatroom["agents"][chatroom["agent_index"] % len(chatroom["agents"])]
-                agent_name = agent["name"]
-                agent_func = agent["func"]
-
-                prompt = (
-                    f"User said: {user_msg}\n"
-                    f"Last message was: {chatroom['last_message']}\n\n"
-                    f"You are {agent_name}. Reply naturally and keep the conversation moving."
-                )
+            if user_msg.startswith("/chatroom"):
+                selected_agents = persona_registry.resolve_many(user_msg.split()[1:])
 
-                reply = agent_func(prompt)
+                if not selected_agents:
+                    await manager.broadcast(room, {
+                        "author": "System",
+                        "content": "No agents found! Example: /chatroom scientist poet"
+                    })
+                    continue
 
-                log_chatroom(
-                    db=db,
-                    role="ai",
-                    chatroom_id=chatroom_id,
-                    message=reply,
-                    ai_name=agent_name
-                )
+                room = await manager.create_room(selected_agents)
+                manager.rooms.join(websocket, room)
 
-                await manager.broadcast({
-                    "author": agent_name,
-                    "content": reply
+                await manager.broadcast(room, {
+                    "author": "System",
+                    "content": f"Chatroom created with: {', '.join(room.agents)}"
                 })
 
-                chatroom["last_message"] = reply
-                chatroom["agent_index"] += 1
+                await manager.broadcast(room, {
+                    "author": "System",
+                    "content": f"Chatroom started. Agents are waiting for you to speak... Others can join with /join {room.id}"
+                })
                 continue
 
             # -----------------------------------------------------------
-            # DIRECT AGENT CHAT
+            # CHATROOM MESSAGE HANDLING
             # -----------------------------------------------------------
-            lower = user_msg.lower()
-            selected = None
-            cleaned = None
-
-            for a in AGENTS:
-                key = a["name"].lower().replace("ai", "")
-                if lower.startswith(key + " "):
-                    selected = a
-                    cleaned = user_msg[len(key) + 1:].strip()
-                    break
-
-            if selected:
-                reply = selected["func"](cleaned)
-
-                log_chat(
-                    db=db,
-                    role="ai",
-                    content=reply,
-                    ai_name=selected["name"]
-                )
-
-                await manager.broadcast({
-                    "author": selected["name"],
-                    "content": reply
-                })
+            if room.is_chatroom and not user_msg.startswith(("/debate", "/replay")):
+                if not submit_chatroom_message(room, user_msg):
+                    await manager.send(websocket, {
+                        "author": "System",
+                        "content": "The room is busy, please wait for the agents to catch up."
+                    })
                 continue
 
             # -----------------------------------------------------------
-            # BASE FALLBACK
+            # DEBATE / REPLAY / DIRECT / BASE
             # -----------------------------------------------------------
-            base_ai = next(a for a in AGENTS if a["name"].lower() == "base")
-            reply = base_ai["func"](user_msg)
-
-            log_chat(
-                db=db,
-                role="ai",
-                content=reply,
-                ai_name="Base"
-            )
-
-            await manager.broadcast({
-                "author": "BASE",
-                "content": reply
-            })
+            cancel(generation)
+            generation = asyncio.create_task(generate(websocket, room, session_id, user_msg))
 
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        pass
     finally:
-        db.close()
-
+        cancel(generation)
+        manager.disconnect(websocket)
+        forget_scope(session_id)
@@ -18,6 +18,19 @@ const AGENTS = [
 
 const WS_URL = "ws://127.0.0.1:8000/ws";
 
+// Compressed binary frames (see broadcast.py) where the browser can inflate them.
+// Some browsers have DecompressionStream but not the "deflate-raw" format.
+const COMPRESSED_FRAMES = (() => {
+  try {
+    new DecompressionStream("deflate-raw");
+    return true;
+  } catch {
+    return false;
+  }
+})();
+const FRAME_PROTOCOLS = COMPRESSED_FRAMES ? ["agora.deflate-json", "agora.json"] : ["agora.json"];
+const textDecoder = new TextDecoder();
+
 const statusEl = document.getElementById("conn");
 const messagesEl = document.getElementById("messages");
 const inputBox = document.getElementById("inputBox");
@@ -41,6 +54,8 @@ let currentAI = null;
 
 let draggedItem = null;  // the <li> being dragged
 
+const streamingEls = {};  // message id -> content element of a streaming reply
+
 
 // ======================================================
 // DEBATE POPUP
@@ -198,6 +213,65 @@ function addMessage(author, content) {
 }
 
 
+// ======================================================
+// STREAMED REPLIES (start / delta / end frames)
+// ======================================================
+function startStream(id, author) {
+  const wrapper = document.createElement("div");
+  wrapper.className = "msg bot";
+
+  const authorEl = document.createElement("div");
+  authorEl.className = "author";
+  authorEl.innerText = author;
+
+  const contentEl = document.createElement("div");
+  contentEl.className = "content";
+
+  wrapper.appendChild(authorEl);
+  wrapper.appendChild(contentEl);
+  messagesEl.appendChild(wrapper);
+  messagesEl.scrollTop = messagesEl.scrollHeight;
+
+  streamingEls[id] = contentEl;
+}
+
+function appendStream(id, delta) {
+  const contentEl = streamingEls[id];
+  if (!contentEl) return;
+
+  contentEl.innerText += delta;
+  messagesEl.scrollTop = messagesEl.scrollHeight;
+}
+
+function endStream(id, author, content) {
+  const contentEl = streamingEls[id];
+  delete streamingEls[id];
+
+  // Missed the start frame (e.g. reconnected mid-reply): show the full text
+  if (!contentEl) {
+    addMessage(author, content);
+    return;
+  }
+  contentEl.innerText = content;
+}
+
+function handleFrame(data) {
+  switch (data.type) {
+    case "start":
+      startStream(data.id, data.author ?? "Server");
+      break;
+    case "delta":
+      appendStream(data.id, data.content ?? "");
+      break;
+    case "end":
+      endStream(data.id, data.author ?? "Server", data.content ?? "");
+      break;
+    default:
+      addMessage(data.author ?? "Server", data.content ?? "");
+  }
+}
+
+
 
 // ======================================================
 // STATUS
@@ -213,7 +287,8 @@ function setStatus(text, color = null) {
 // ======================================================
 function connect() {
   try {
-    ws = new WebSocket(WS_URL);
+    ws = new WebSocket(WS_URL, FRAME_PROTOCOLS);
+    ws.binaryType = "arraybuffer";
   } catch (err) {
     scheduleReconnect();
     return;
@@ -224,13 +299,20 @@ function connect() {
     sendBtn.disabled = false;
   };
 
+  // Binary frames may need async inflating; chain them so frames stay in order
+  let pending = Promise.resolve();
+
   ws.onmessage = (event) => {
-    try {
-      const data = JSON.parse(event.data);
-      addMessage(data.author ?? "Server", data.content ?? "");
-    } catch {
-      addMessage("Server", event.data);
-    }
+    pending = pending
+      .then(() => decodeFrame(event.data))
+      .then((text) => {
+        try {
+          handleFrame(JSON.parse(text));
+        } catch {
+          addMessage("Server", text);
+        }
+      })
+      .catch((err) => console.error("Bad frame", err));
   };
 
   ws.onclose = () => {
@@ -245,6 +327,18 @@ function connect() {
   };
 }
 
+// Text frames are JSON; binary frames are a flag byte (0 = plain, 1 = raw DEFLATE) + UTF-8 JSON
+async function decodeFrame(data) {
+  if (typeof data === "string") return data;
+
+  const bytes = new Uint8Array(data);
+  const body = bytes.subarray(1);
+  if (bytes[0] === 0) return textDecoder.decode(body);
+
+  const stream = new Blob([body]).stream().pipeThrough(new DecompressionStream("deflate-raw"));
+  return new Response(stream).text();
+}
+
 function scheduleReconnect() {
   setTimeout(connect, reconnectTimeout);
   reconnectTimeout = Math.min(30000, reconnectTimeout * 1.5);
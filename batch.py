@@ -0,0 +1,292 @@
+# ============================================================
+# batch.py — run scripted debates headless, from a manifest
+#
+#   python batch.py debates.jsonl --out runs/ --concurrency 8
+#
+# The manifest is JSON Lines (or one JSON array), one debate each:
+#
+#   {"topic": "Tabs or spaces?", "agents": ["coder", "poet"], "rounds": 3}
+#   {"id": "eval-42", "topic": "...", "agents": ["scientist", "villain"]}
+#
+# "id" is optional; without it a debate is keyed by a hash of its topic,
+# agents and rounds. Finished ids are appended to a checkpoint file, so
+# re-running the same command after a crash or Ctrl-C skips them and
+# retries only what failed or never ran. Transcripts go to
+# <out>/transcripts.jsonl (one debate per line), to the chatroom_logs
+# table (--to db, chatroom_id = debate id), or both. A debate stored
+# but not yet checkpointed when the process died is run again: its DB
+# rows are replaced, but the file gets a second line, so keep the last
+# line per id when reading transcripts.jsonl.
+#
+# Several processes can share one manifest with --shard K/N, each
+# writing its own transcripts-K.jsonl / checkpoint-K.jsonl.
+# ============================================================
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+from agents2 import persona_registry
+from context import RoomContext
+from orchestrator import TURN_TIMEOUT, Orchestrator, debate_prompt
+from scheduler import BACKGROUND, PROVIDER_MAX_IN_FLIGHT, request_context, scheduler
+
+
+# ============================================================
+# MANIFEST
+# ============================================================
+
+def debate_id(topic: str, agents: list[str], rounds: int) -> str:
+    key = json.dumps([topic, agents, rounds], ensure_ascii=False)
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def load_manifest(path) -> list[dict]:
+    """Validated debates from a JSONL (or JSON array) file; persona names resolved like /debate."""
+    text = Path(path).read_text(encoding="utf-8")
+    if text.lstrip().startswith("["):
+        entries = list(enumerate(json.loads(text), 1))
+    else:
+        entries = [(n, json.loads(line)) for n, line in enumerate(text.splitlines(), 1) if line.strip()]
+
+    debates = []
+    for n, entry in entries:
+        topic = str(entry.get("topic") or "").strip()
+        names = entry.get("agents") or []
+        if isinstance(names, str):
+            names = names.split()
+        agents = persona_registry.resolve_many(names)
+        rounds = entry.get("rounds", 1)
+        if not topic or not agents or not isinstance(rounds, int) or rounds < 1:
+            raise ValueError(f"{path}:{n}: needs a topic, known agents and rounds >= 1")
+        debates.append({
+            "id": str(entry.get("id") or debate_id(topic, agents, rounds)),
+            "topic": topic,
+            "agents": agents,
+            "rounds": rounds,
+        })
+    return debates
+
+
+def parse_shard(spec: str) -> tuple[int, int]:
+    index, _, count = spec.partition("/")
+    index, count = int(index), int(count)
+    if not 0 <= index < count:
+        raise argparse.ArgumentTypeError("--shard must be K/N with 0 <= K < N")
+    return index, count
+
+
+def in_shard(debate: dict, shard) -> bool:
+    if shard is None:
+        return True
+    index, count = shard
+    return int(hashlib.sha1(debate["id"].encode()).hexdigest(), 16) % count == index
+
+
+# ============================================================
+# CHECKPOINT / OUTPUT
+# ============================================================
+
+def _repair_tail(path: Path):
+    """Drop a half-written last line left by a crash mid-append."""
+    if not path.exists() or path.stat().st_size == 0:
+        return
+    data = path.read_bytes()
+    if not data.endswith(b"\n"):
+        path.write_bytes(data[:data.rfind(b"\n") + 1])
+
+
+class Checkpoint:
+    """Append-only record of finished debate ids, fsync'd after every entry."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        _repair_tail(path)
+        self.done = set()
+        if path.exists():
+            for line in path.read_text(encoding="utf-8").splitlines():
+                entry = json.loads(line)
+                if entry["status"] == "done":
+                    self.done.add(entry["id"])
+        self._file = path.open("a", encoding="utf-8")
+
+    def record(self, debate_id: str, status: str, error: str | None = None):
+        self._file.write(json.dumps({"id": debate_id, "status": status, "error": error}) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class FileSink:
+    """One JSON line per finished debate."""
+
+    def __init__(self, path: Path):
+        _repair_tail(path)
+        self._file = path.open("a", encoding="utf-8")
+
+    def write(self, transcript: dict):
+        self._file.write(json.dumps(transcript, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class DbSink:
+    """A debate's rows in one bulk INSERT; rows from an earlier, uncheckpointed attempt are replaced."""
+
+    def write(self, transcript: dict):
+        from sqlalchemy import delete, insert
+
+        from database import session_scope
+        from models import ChatroomLog
+
+        chatroom_id = transcript["id"]
+        rows = [{
+            "role": "user",
+            "chatroom_id": chatroom_id,
+            "message": transcript["topic"],
+            "created_at": datetime.fromisoformat(transcript["started_at"]),
+        }]
+        rows += [{
+            "role": "ai",
+            "ai_name": turn["agent"],
+            "chatroom_id": chatroom_id,
+            "message": turn["reply"],
+            "created_at": datetime.fromisoformat(turn["created_at"]),
+        } for turn in transcript["turns"] if turn["reply"] is not None]
+
+        with session_scope() as db:
+            db.execute(delete(ChatroomLog).where(ChatroomLog.chatroom_id == chatroom_id))
+            db.execute(insert(ChatroomLog), rows)
+
+    def close(self):
+        pass
+
+
+# ============================================================
+# RUNNER
+# ============================================================
+
+async def run_debate(orchestrator: Orchestrator, debate: dict) -> dict:
+    """One debate, same prompts and bounded context as /debate, collected instead of broadcast."""
+    started_at = datetime.utcnow()
+    context = RoomContext()
+    turns = []
+
+    with request_context(BACKGROUND, debate["id"]):
+        for round_no in range(1, debate["rounds"] + 1):
+            transcript = context.render()
+            prompts = [
+                (agent, debate_prompt(agent, debate["topic"], round_no, debate["rounds"], transcript))
+                for agent in debate["agents"]
+            ]
+            async for result in orchestrator.fan_out(prompts):
+                turns.append({
+                    "round": round_no,
+                    "agent": result.agent,
+                    "reply": result.reply,
+                    "error": result.error,
+                    "created_at": datetime.utcnow().isoformat(),
+                })
+                if result.reply is not None:
+                    context.add(result.agent, result.reply)
+
+    if not any(turn["reply"] is not None for turn in turns):
+        raise RuntimeError(f"every turn failed, last error: {turns[-1]['error']}")
+
+    return {**debate, "started_at": started_at.isoformat(), "turns": turns}
+
+
+async def run_batch(debates, sinks, checkpoint: Checkpoint, concurrency: int, orchestrator: Orchestrator):
+    queue = asyncio.Queue()
+    for debate in debates:
+        queue.put_nowait(debate)
+
+    total = len(debates)
+    done = failed = 0
+    start = time.perf_counter()
+
+    async def worker():
+        nonlocal done, failed
+        while True:
+            try:
+                debate = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                transcript = await run_debate(orchestrator, debate)
+                # Sinks are blocking I/O; the checkpoint only records a debate once it is stored
+                for sink in sinks:
+                    await asyncio.to_thread(sink.write, transcript)
+                checkpoint.record(debate["id"], "done")
+                done += 1
+            except Exception as exc:
+                checkpoint.record(debate["id"], "failed", str(exc) or type(exc).__name__)
+                failed += 1
+                print(f"Debate {debate['id']} failed: {exc}")
+
+            finished = done + failed
+            if finished % 10 == 0 or finished == total:
+                elapsed = time.perf_counter() - start
+                print(f"{finished}/{total} debates ({failed} failed), {finished / elapsed:.2f}/s")
+
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
+    return done, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run scripted debates from a manifest, resumably")
+    parser.add_argument("manifest", help="JSONL (or JSON array) of {id?, topic, agents, rounds}")
+    parser.add_argument("--out", default="runs", help="directory for transcripts and the checkpoint")
+    parser.add_argument("--to", choices=("files", "db", "both"), default="files")
+    parser.add_argument("--concurrency", type=int, default=8, help="debates in progress at once")
+    parser.add_argument("--max-calls", type=int, default=PROVIDER_MAX_IN_FLIGHT, help="provider calls in flight at once")
+    parser.add_argument("--turn-timeout", type=float, default=TURN_TIMEOUT)
+    parser.add_argument("--shard", type=parse_shard, help="K/N: run only this process's share of the manifest")
+    args = parser.parse_args()
+
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    suffix = f"-{args.shard[0]}" if args.shard else ""
+
+    debates = [d for d in load_manifest(args.manifest) if in_shard(d, args.shard)]
+    checkpoint = Checkpoint(out / f"checkpoint{suffix}.jsonl")
+    seen = set()
+    pending = []
+    for debate in debates:
+        if debate["id"] not in checkpoint.done and debate["id"] not in seen:
+            seen.add(debate["id"])
+            pending.append(debate)
+    print(f"{len(debates)} debates in manifest, {len(debates) - len(pending)} already done, {len(pending)} to run")
+
+    sinks = []
+    if args.to in ("files", "both"):
+        sinks.append(FileSink(out / f"transcripts{suffix}.jsonl"))
+    if args.to in ("db", "both"):
+        sinks.append(DbSink())
+
+    # The scheduler's in-flight cap is what bounds provider calls across debates
+    scheduler.max_in_flight = args.max_calls
+    orchestrator = Orchestrator(turn_timeout=args.turn_timeout)
+    try:
+        done, failed = asyncio.run(run_batch(pending, sinks, checkpoint, args.concurrency, orchestrator))
+        print(f"Finished: {done} done, {failed} failed (re-run to retry failures)")
+    except KeyboardInterrupt:
+        print("Interrupted; re-run the same command to resume.")
+    finally:
+        checkpoint.close()
+        for sink in sinks:
+            sink.close()
+
+
+if __name__ == "__main__":
+    main()
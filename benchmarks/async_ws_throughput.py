@@ -0,0 +1,113 @@
+# ============================================================
+# benchmarks/async_ws_throughput.py
+#
+# Drives app.app.websocket_endpoint with N fake sockets against a
+# local fake provider and compares the old blocking persona call
+# with the async one. No network or database needed.
+#
+#   python -m benchmarks.async_ws_throughput --clients 50 --messages 3
+# ============================================================
+
+import argparse
+import asyncio
+import json
+import time
+
+from fastapi import WebSocketDisconnect
+
+import agents2
+import app.app as server
+from providers import FakeProvider
+
+
+# ============================================================
+# FAKE PROVIDER
+# ============================================================
+
+def install_fake_provider(latency):
+    agents2.use_provider(FakeProvider(ttft=latency, reply="fake reply"))
+
+
+# ============================================================
+# FAKE SOCKET / DB
+# ============================================================
+
+class FakeWebSocket:
+    """Sends its next message once the previous one is answered (a new message would supersede it)."""
+
+    scope = {"type": "websocket", "subprotocols": [], "query_string": b""}
+
+    def __init__(self, messages):
+        self.messages = list(messages)
+        self.sent = 0
+        self.replied = None
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def receive_text(self):
+        if self.replied is not None:
+            await self.replied.wait()
+        if not self.messages:
+            raise WebSocketDisconnect()
+        self.replied = asyncio.Event()
+        return self.messages.pop(0)
+
+    async def send_text(self, data):
+        self.sent += 1
+        if json.loads(data).get("author") not in ("User", "System"):
+            self.replied.set()
+
+
+async def _no_log(*args, **kwargs):
+    pass
+
+
+def install_fake_db():
+    server.log_chat = _no_log
+    server.log_chatroom = _no_log
+
+
+async def _blocking_call_persona(name, message, scope=agents2.GLOBAL_SCOPE):
+    # The pre-async handler: a synchronous provider call inside the coroutine
+    # (agents2.call_persona now refuses to block the loop, so call the provider directly)
+    system_prompt = agents2.build_system_prompt(name, scope, query=message)
+    request = agents2.completion_request(system_prompt, message)
+    return agents2.router.create(agents2.persona_routes(name), **request).choices[0].message.content
+
+
+# ============================================================
+# RUN
+# ============================================================
+
+async def run(clients, messages):
+    server.manager = server.ConnectionManager()
+    sockets = [FakeWebSocket(["coder hello"] * messages) for _ in range(clients)]
+
+    start = time.perf_counter()
+    await asyncio.gather(*(server.websocket_endpoint(ws) for ws in sockets))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Blocking vs async persona calls over fake sockets")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake provider latency (s)")
+    args = parser.parse_args()
+
+    install_fake_provider(args.latency)
+    install_fake_db()
+    server.STREAM_REPLIES = False
+    replies = args.clients * args.messages
+
+    async_call = server.call_persona_async
+    for label, persona_call in (("blocking", _blocking_call_persona), ("async", async_call)):
+        server.call_persona_async = persona_call
+        elapsed = asyncio.run(run(args.clients, args.messages))
+        print(f"{label:>9}: {replies} replies in {elapsed:.2f}s -> {replies / elapsed:8.1f} replies/s")
+    server.call_persona_async = async_call
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# ============================================================
+# benchmarks/broadcast_fanout.py
+#
+# Broadcasts M messages to N simulated sockets, a few of which are
+# slow, comparing the old one-socket-at-a-time loop (json.dumps per
+# socket) with Broadcaster's serialize-once per-socket queues.
+#
+#   python -m benchmarks.broadcast_fanout --clients 1000 --slow 10
+# ============================================================
+
+import argparse
+import asyncio
+import json
+import time
+
+from broadcast import Broadcaster
+
+
+class FakeSocket:
+    def __init__(self, delay):
+        self.delay = delay
+        self.received = 0
+
+    async def send_text(self, data):
+        await asyncio.sleep(self.delay)
+        self.received += 1
+
+    async def close(self, code=1000, reason=None):
+        pass
+
+
+def make_sockets(args):
+    return [FakeSocket(args.slow_delay if i < args.slow else 0) for i in range(args.clients)]
+
+
+def message(i):
+    # Stream deltas: the only frames the "drop" policy may discard
+    return {"type": "delta", "id": "bench", "content": f"paragraph {i} " + "lorem ipsum " * 80}
+
+
+async def sequential(args):
+    sockets = make_sockets(args)
+    start = time.perf_counter()
+    for i in range(args.messages):
+        for ws in sockets:
+            await ws.send_text(json.dumps(message(i)))
+        await asyncio.sleep(args.interval)
+    return time.perf_counter() - start, sockets
+
+
+async def queued(args, policy):
+    sockets = make_sockets(args)
+    broadcaster = Broadcaster(queue_size=args.queue_size, policy=policy)
+    for ws in sockets:
+        broadcaster.register(ws)
+
+    fast = sockets[args.slow:]
+    publish_time = 0.0
+    start = time.perf_counter()
+    for i in range(args.messages):
+        t0 = time.perf_counter()
+        broadcaster.publish(sockets, message(i))
+        publish_time += time.perf_counter() - t0
+        await asyncio.sleep(args.interval)  # e.g. streamed deltas arriving over time
+
+    # Time until every fast client has everything; slow ones lag on their own
+    deadline = start + 30
+    while any(ws.received < args.messages for ws in fast) and time.perf_counter() < deadline:
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+
+    stats = broadcaster.stats()
+    for ws in sockets:
+        broadcaster.unregister(ws)
+    return elapsed, publish_time, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sequential vs queued broadcast fan-out")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--slow", type=int, default=10, help="number of slow clients")
+    parser.add_argument("--slow-delay", type=float, default=0.02, help="seconds per send for slow clients")
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.005, help="seconds between messages")
+    parser.add_argument("--queue-size", type=int, default=8, help="per-socket outbox size")
+    args = parser.parse_args()
+
+    elapsed, _ = asyncio.run(sequential(args))
+    print(f"sequential : {elapsed:.3f}s for {args.messages} messages to {args.clients} clients")
+
+    for policy in ("drop", "disconnect"):
+        elapsed, publish_time, stats = asyncio.run(queued(args, policy))
+        print(
+            f"{policy:>10} : {elapsed:.3f}s until all fast clients received "
+            f"(publish {publish_time * 1000:.1f}ms) "
+            f"dropped={stats['frames_dropped']} slow_disconnects={stats['slow_disconnects']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
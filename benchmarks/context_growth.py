@@ -0,0 +1,59 @@
+# ============================================================
+# benchmarks/context_growth.py
+#
+# Prompt size versus turn count for a long debate: sending the full
+# history every turn versus RoomContext's budgeted ring buffer and
+# rolling summary. Also times RoomContext.add/render per turn.
+#
+#   python -m benchmarks.context_growth --turns 500 --reply-words 120
+# ============================================================
+
+import argparse
+import random
+import time
+
+from context import RoomContext, count_tokens
+
+
+WORDS = "argument evidence however therefore premise conclusion history ethics data model".split()
+
+
+def fake_reply(rng, words):
+    body = " ".join(rng.choice(WORDS) for _ in range(words))
+    return body[0].upper() + body[1:] + "."
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt tokens per turn: full history vs RoomContext")
+    parser.add_argument("--turns", type=int, default=500)
+    parser.add_argument("--reply-words", type=int, default=120)
+    parser.add_argument("--agents", type=int, default=4)
+    parser.add_argument("--every", type=int, default=50, help="print a row every N turns")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    context = RoomContext()
+    history = []
+    add_render_seconds = 0.0
+
+    print(f"{'turn':>6} {'full history':>14} {'RoomContext':>12}")
+    for turn in range(1, args.turns + 1):
+        author = f"Agent{turn % args.agents}"
+        reply = fake_reply(rng, args.reply_words)
+
+        history.append(f"{author}: {reply}")
+        start = time.perf_counter()
+        context.add(author, reply)
+        rendered = context.render()
+        add_render_seconds += time.perf_counter() - start
+
+        if turn % args.every == 0 or turn == 1:
+            naive = count_tokens("\n\n".join(history))
+            print(f"{turn:>6} {naive:>14} {count_tokens(rendered):>12}")
+
+    print(f"budget {context.budget} + summary {context.summary_budget} tokens; "
+          f"add+render {add_render_seconds / args.turns * 1e6:.1f} us/turn")
+
+
+if __name__ == "__main__":
+    main()
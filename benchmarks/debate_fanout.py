@@ -0,0 +1,94 @@
+# ============================================================
+# benchmarks/debate_fanout.py
+#
+# Times one debate round run agent-by-agent against the same round
+# through Orchestrator.fan_out, using a fake persona call with a
+# fixed per-agent latency. No network needed.
+#
+# The "app defaults" case runs --rooms debates at once through one
+# Orchestrator() built with the app's settings, as app.app does.
+#
+#   python -m benchmarks.debate_fanout --agents 5 --rounds 3 --rooms 10
+# ============================================================
+
+import argparse
+import asyncio
+import random
+import time
+
+from orchestrator import Orchestrator
+
+
+def make_fake_call(latencies):
+    async def fake_call(agent, prompt):
+        await asyncio.sleep(latencies[agent])
+        return f"{agent} argues about {len(prompt)} chars of context"
+    return fake_call
+
+
+async def sequential_round(call, turns):
+    return [await call(agent, prompt) for agent, prompt in turns]
+
+
+async def run(args, latencies):
+    call = make_fake_call(latencies)
+    turns = [(agent, "topic") for agent in latencies]
+    orchestrator = Orchestrator(call=call, max_concurrency=args.concurrency, turn_timeout=args.timeout)
+
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        await sequential_round(call, turns)
+    sequential = (time.perf_counter() - start) / args.rounds
+
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        results = await orchestrator.run_round(turns)
+    concurrent = (time.perf_counter() - start) / args.rounds
+
+    assert [r.agent for r in results] == list(latencies), "results out of order"
+    return sequential, concurrent
+
+
+async def run_app_defaults(args, latencies):
+    """--rooms debates sharing one default Orchestrator, like the app's module-level one."""
+    orchestrator = Orchestrator(call=make_fake_call(latencies))
+    turns = [(agent, "topic") for agent in latencies]
+
+    async def debate():
+        for _ in range(args.rounds):
+            await orchestrator.run_round(turns)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(debate() for _ in range(args.rooms)))
+    return (time.perf_counter() - start) / args.rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sequential vs concurrent debate rounds")
+    parser.add_argument("--agents", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=0, help="turns per round at once, 0 = all")
+    parser.add_argument("--rooms", type=int, default=10, help="concurrent debates in the app-defaults case")
+    parser.add_argument("--timeout", type=float, default=5.0)
+    parser.add_argument("--min-latency", type=float, default=0.05)
+    parser.add_argument("--max-latency", type=float, default=0.25)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    latencies = {
+        f"Agent{i}": rng.uniform(args.min_latency, args.max_latency)
+        for i in range(args.agents)
+    }
+
+    sequential, concurrent = asyncio.run(run(args, latencies))
+    print(f"slowest agent : {max(latencies.values()):.3f}s")
+    print(f"sum of agents : {sum(latencies.values()):.3f}s")
+    print(f"sequential    : {sequential:.3f}s / round")
+    print(f"fan_out       : {concurrent:.3f}s / round")
+
+    app_defaults = asyncio.run(run_app_defaults(args, latencies))
+    print(f"app defaults  : {app_defaults:.3f}s / round with {args.rooms} rooms debating at once")
+
+
+if __name__ == "__main__":
+    main()
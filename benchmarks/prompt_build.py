@@ -0,0 +1,44 @@
+# ============================================================
+# benchmarks/prompt_build.py
+#
+# Micro-benchmark of system prompt construction for every persona:
+# rendering the full prompt from PERSONAS on each call versus the
+# precompiled prompt plus cached memory suffix.
+#
+#   python -m benchmarks.prompt_build --iterations 20000
+# ============================================================
+
+import argparse
+import timeit
+
+import agents2
+
+
+def uncached_build(name):
+    # What build_system_prompt did before prompts were compiled
+    mem = agents2.memory_store.facts(name, agents2.GLOBAL_SCOPE)
+    memory = "\nRelevant Memory:\n" + "\n".join(f"- {m}" for m in mem) + "\n" if mem else ""
+    return agents2.compile_persona_prompt(name, agents2.PERSONAS[name]) + memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Persona prompt construction cost")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--memories", type=int, default=10, help="memory facts per persona")
+    args = parser.parse_args()
+
+    names = list(agents2.PERSONAS)
+    for name in names:
+        for i in range(args.memories):
+            agents2.remember(name, f"fact number {i} about {name}")
+
+    assert all(uncached_build(n) == agents2.build_system_prompt(n) for n in names)
+
+    for label, build in (("uncached", uncached_build), ("compiled", agents2.build_system_prompt)):
+        seconds = timeit.timeit(lambda: [build(n) for n in names], number=args.iterations)
+        per_prompt = seconds / (args.iterations * len(names)) * 1e6
+        print(f"{label:>9}: {per_prompt:6.2f} us/prompt ({len(names)} personas x {args.iterations})")
+
+
+if __name__ == "__main__":
+    main()
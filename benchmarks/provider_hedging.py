@@ -0,0 +1,87 @@
+# ============================================================
+# benchmarks/provider_hedging.py
+#
+# providers.Router against two local mock providers whose latency
+# is drawn from a distribution with a slow tail (most calls take
+# ~--base seconds, --tail-rate of them take ~--tail seconds).
+#
+#   single    primary route only
+#   hedged    primary, hedged to the backup past the primary's p95
+#   fallback  primary failing --error-rate of calls, backup behind it
+#
+#   python -m benchmarks.provider_hedging --requests 400 --tail-rate 0.05
+# ============================================================
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from providers import FakeProvider, Router, register_provider
+
+
+def latency_distribution(base, tail, tail_rate):
+    def sample():
+        if random.random() < tail_rate:
+            return random.uniform(tail * 0.5, tail * 1.5)
+        return random.lognormvariate(0, 0.25) * base
+    return sample
+
+
+async def run(router, routes, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await router.acreate(routes, messages=[{"role": "user", "content": "hi"}])
+            except Exception:
+                failures += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies, failures
+
+
+def fmt(latencies):
+    if len(latencies) < 2:
+        return "n/a"
+    q = statistics.quantiles(latencies, n=100, method="inclusive")
+    return f"p50 {q[49] * 1000:7.1f}ms  p95 {q[94] * 1000:7.1f}ms  p99 {q[98] * 1000:7.1f}ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Provider fallback and hedged requests against mock providers")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--base", type=float, default=0.05, help="typical latency (s)")
+    parser.add_argument("--tail", type=float, default=1.0, help="slow-tail latency (s)")
+    parser.add_argument("--tail-rate", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.2, help="primary failure rate in the fallback run")
+    parser.add_argument("--max-hedge-ratio", type=float, default=0.1)
+    args = parser.parse_args()
+
+    distribution = latency_distribution(args.base, args.tail, args.tail_rate)
+    routes = (("primary", "mock"), ("backup", "mock"))
+
+    scenarios = [
+        ("single", Router(hedge=False), routes[:1], 0.0),
+        ("hedged", Router(hedge=True, max_hedge_ratio=args.max_hedge_ratio), routes, 0.0),
+        ("fallback", Router(hedge=False), routes, args.error_rate),
+    ]
+    for label, router, scenario_routes, error_rate in scenarios:
+        register_provider("primary", FakeProvider(ttft=distribution, reply="ok", error_rate=error_rate))
+        register_provider("backup", FakeProvider(ttft=distribution, reply="ok"))
+        latencies, failures = asyncio.run(run(router, scenario_routes, args.requests, args.concurrency))
+        stats = router.stats()
+        print(f"{label:>9}: {fmt(latencies)}  failures={failures} "
+              f"fallbacks={stats['fallbacks']} hedges={stats['hedges']} hedge_wins={stats['hedge_wins']}")
+
+
+if __name__ == "__main__":
+    main()
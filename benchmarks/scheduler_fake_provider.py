@@ -0,0 +1,119 @@
+# ============================================================
+# benchmarks/scheduler_fake_provider.py
+#
+# Exercises scheduler.Scheduler against a local fake provider that
+# enforces its own requests/minute limit and answers 429 beyond it.
+# A burst of background debate turns from several rooms competes with
+# a trickle of direct user requests.
+#
+#   python -m benchmarks.scheduler_fake_provider --rpm 600 --rooms 3
+# ============================================================
+
+import argparse
+import asyncio
+import statistics
+import time
+from collections import deque
+
+from scheduler import BACKGROUND, DIRECT, Scheduler, request_context
+
+
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+
+class FakeProvider:
+    """Rejects calls beyond `rpm` in any rolling 60s window (scaled by `window`)."""
+
+    def __init__(self, rpm, latency, window=60.0):
+        self.rpm = rpm
+        self.latency = latency
+        self.window = window
+        self.calls = deque()
+        self.rejected = 0
+
+    async def complete(self):
+        now = time.monotonic()
+        while self.calls and now - self.calls[0] > self.window:
+            self.calls.popleft()
+        if len(self.calls) >= self.rpm:
+            self.rejected += 1
+            raise FakeRateLimitError("rate limited")
+        self.calls.append(now)
+        await asyncio.sleep(self.latency)
+        return "ok"
+
+
+async def timed(call, priority, room):
+    with request_context(priority, room):
+        start = time.perf_counter()
+        try:
+            await call()
+            return priority, room, time.perf_counter() - start, None
+        except Exception as exc:
+            return priority, room, time.perf_counter() - start, exc
+
+
+async def scenario(args, use_scheduler):
+    provider = FakeProvider(args.rpm, args.latency, window=args.window)
+    scheduler = Scheduler(
+        rpm=args.rpm * 60 / args.window,
+        burst_seconds=args.window / 4,
+        max_retries=5,
+        retry_base=0.05,
+        retry_max=1,
+    )
+
+    async def call():
+        if use_scheduler:
+            return await scheduler.run(provider.complete, tokens=0)
+        return await provider.complete()
+
+    jobs = []
+    for room in range(args.rooms):
+        for _ in range(args.background):
+            jobs.append(asyncio.create_task(timed(call, BACKGROUND, f"room{room}")))
+
+    for i in range(args.direct):
+        await asyncio.sleep(args.direct_interval)
+        jobs.append(asyncio.create_task(timed(call, DIRECT, f"user{i}")))
+
+    results = await asyncio.gather(*jobs)
+    failed = sum(1 for *_, exc in results if exc is not None)
+    direct = [t for p, _, t, exc in results if p == DIRECT and exc is None]
+    background = [t for p, _, t, exc in results if p == BACKGROUND and exc is None]
+    per_room = {}
+    for p, room, t, exc in results:
+        if p == BACKGROUND and exc is None:
+            per_room.setdefault(room, []).append(t)
+    return failed, provider.rejected, direct, background, per_room, scheduler.stats()
+
+
+def fmt(latencies):
+    if not latencies:
+        return "n/a"
+    return f"p50 {statistics.median(latencies) * 1000:7.1f}ms  max {max(latencies) * 1000:7.1f}ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scheduler against a rate-limited fake provider")
+    parser.add_argument("--rpm", type=int, default=20, help="provider limit per window")
+    parser.add_argument("--window", type=float, default=2.0, help="provider window in seconds (60 = real minute)")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--rooms", type=int, default=3)
+    parser.add_argument("--background", type=int, default=10, help="debate turns per room")
+    parser.add_argument("--direct", type=int, default=5)
+    parser.add_argument("--direct-interval", type=float, default=0.2)
+    args = parser.parse_args()
+
+    for label, use_scheduler in (("raw calls", False), ("scheduler", True)):
+        failed, rejected, direct, background, per_room, stats = asyncio.run(scenario(args, use_scheduler))
+        print(f"{label}: failed={failed} provider_429s={rejected} retries={stats['retries']}")
+        print(f"    direct     {fmt(direct)}")
+        print(f"    background {fmt(background)}")
+        for room, latencies in sorted(per_room.items()):
+            print(f"      {room:<8} {fmt(latencies)}")
+
+
+if __name__ == "__main__":
+    main()
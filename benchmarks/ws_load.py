@@ -0,0 +1,292 @@
+# ============================================================
+# benchmarks/ws_load.py
+#
+# Load test for the /ws endpoint. Drives app.app:app in-process over
+# ASGI with N concurrent WebSocket clients, with the provider replaced
+# by a stub that waits `--ttft`, then streams `--tokens` tokens
+# `--token-latency` apart. No network, database or API key needed.
+#
+# Scenarios:
+#   direct    every client chats with CoderAI from the lobby
+#   chatroom  clients share chatrooms of --room-size members
+#   debate    every client runs a /debate in its own chatroom
+#
+# Reports p50/p95/p99 latency (send -> final reply frame), time to
+# first token, throughput, bytes on the wire and event-loop lag.
+# --frames deflate connects with the compressed binary frame protocol.
+#
+#   python -m benchmarks.ws_load --clients 100 --messages 5
+#   python -m benchmarks.ws_load --scenario debate --clients 20 --rounds 2
+# ============================================================
+
+import argparse
+import asyncio
+import json
+import re
+import statistics
+import time
+
+import agents2
+import app.app as server
+from broadcast import BINARY_PROTOCOL, unpack
+from providers import FakeProvider
+
+
+# ============================================================
+# STUB PROVIDER
+# ============================================================
+
+# Clients tag each message with a marker the stub echoes back first,
+# so a client can pick its own reply out of a shared room.
+MARKER = re.compile(r"\[m:([\w-]+)\]")
+
+
+class StubProvider(FakeProvider):
+    """Replies with the caller's marker followed by `tokens` filler tokens."""
+
+    def __init__(self, ttft, tokens, token_latency):
+        super().__init__(ttft=ttft, token_latency=token_latency)
+        self.tokens = tokens
+
+    def reply_text(self, request):
+        found = MARKER.findall(request["messages"][-1]["content"])
+        return " ".join(([f"[m:{found[-1]}]"] if found else []) + ["token"] * self.tokens)
+
+
+async def _no_log(*args, **kwargs):
+    pass
+
+
+def install_stubs(args):
+    agents2.use_provider(StubProvider(args.ttft, args.tokens, args.token_latency))
+    server.log_chat = _no_log
+    server.log_chatroom = _no_log
+    server.STREAM_REPLIES = not args.no_stream
+
+
+# ============================================================
+# ASGI WEBSOCKET CLIENT
+# ============================================================
+
+class Client:
+    """One WebSocket connection to the app, spoken over raw ASGI messages."""
+
+    def __init__(self, app, stats, frames="text"):
+        self.app = app
+        self.stats = stats
+        self.subprotocols = [BINARY_PROTOCOL] if frames == "deflate" else []
+        self.inbound = asyncio.Queue()   # client -> app
+        self.frames = asyncio.Queue()    # app -> client (decoded)
+        self.accepted = asyncio.Event()
+        self.task = None
+
+    async def connect(self):
+        scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "scheme": "ws",
+            "path": "/ws",
+            "raw_path": b"/ws",
+            "root_path": "",
+            "query_string": b"",
+            "headers": [],
+            "subprotocols": self.subprotocols,
+            "client": ("bench", 0),
+            "server": ("bench", 80),
+        }
+        await self.inbound.put({"type": "websocket.connect"})
+        self.task = asyncio.create_task(self.app(scope, self.inbound.get, self._send))
+        await self.accepted.wait()
+
+    async def _send(self, message):
+        kind = message["type"]
+        if kind == "websocket.accept":
+            self.accepted.set()
+        elif kind == "websocket.send":
+            self.stats["frames"] += 1
+            data = message.get("text")
+            if data is None:
+                self.stats["bytes"] += len(message["bytes"])
+                data = unpack(message["bytes"])
+            else:
+                self.stats["bytes"] += len(data.encode())
+            await self.frames.put(json.loads(data))
+
+    async def send(self, text):
+        await self.inbound.put({"type": "websocket.receive", "text": text})
+
+    async def wait_for(self, predicate):
+        while True:
+            frame = await self.frames.get()
+            if predicate(frame):
+                return frame
+
+    async def close(self):
+        await self.inbound.put({"type": "websocket.disconnect", "code": 1000})
+        await self.task
+
+
+def is_reply_to(marker):
+    def predicate(frame):
+        return (
+            frame.get("author") not in ("User", "System")
+            and frame.get("type") in (None, "end")
+            and marker in (frame.get("content") or "")
+        )
+    return predicate
+
+
+async def timed_reply(client, text, marker, results):
+    """Send `text` and record send -> first token and send -> final frame for its reply."""
+    start = time.perf_counter()
+    await client.send(text)
+
+    first = None
+    while True:
+        frame = await client.frames.get()
+        content = frame.get("content") or ""
+        if first is None and marker in content and frame.get("author") != "User":
+            first = time.perf_counter() - start
+        if is_reply_to(marker)(frame):
+            break
+
+    results["latency"].append(time.perf_counter() - start)
+    results["ttft"].append(first)
+
+
+# ============================================================
+# SCENARIOS
+# ============================================================
+
+async def direct_client(n, args, results, stats):
+    client = Client(server.app, stats, args.frames)
+    await client.connect()
+    for i in range(args.messages):
+        marker = f"[m:c{n}-{i}]"
+        await timed_reply(client, f"coder hello {marker}", marker, results)
+        await asyncio.sleep(args.think)
+    await client.close()
+
+
+async def chatroom_group(group, size, args, results, stats):
+    clients = [Client(server.app, stats, args.frames) for _ in range(size)]
+    for client in clients:
+        await client.connect()
+
+    owner = clients[0]
+    await owner.send("/chatroom poet coder scientist")
+    frame = await owner.wait_for(lambda f: "/join " in (f.get("content") or ""))
+    room_id = frame["content"].rsplit("/join ", 1)[1].strip()
+    for client in clients[1:]:
+        await client.send(f"/join {room_id}")
+
+    async def member(n, client):
+        for i in range(args.messages):
+            marker = f"[m:g{group}-{n}-{i}]"
+            await timed_reply(client, f"hello {marker}", marker, results)
+            await asyncio.sleep(args.think)
+
+    await asyncio.gather(*(member(n, c) for n, c in enumerate(clients)))
+    for client in clients:
+        await client.close()
+
+
+async def debate_client(n, args, results, stats):
+    client = Client(server.app, stats, args.frames)
+    await client.connect()
+    await client.send("/chatroom base")  # own room, so debates don't share the lobby
+    await client.wait_for(lambda f: "/join " in (f.get("content") or ""))
+
+    debaters = " ".join(["CoderAI", "PoetAI", "ScientistAI", "LawyerAI", "HistorianAI"][:args.debaters])
+    for i in range(args.messages):
+        start = time.perf_counter()
+        await client.send(f"/debate {debaters} | topic {n}-{i} | {args.rounds}")
+        await client.wait_for(lambda f: f.get("author") == "System" and f.get("content") == "Debate finished.")
+        results["latency"].append(time.perf_counter() - start)
+        await asyncio.sleep(args.think)
+    await client.close()
+
+
+async def loop_lag_monitor(lags, interval=0.01):
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def run_scenario(name, args):
+    server.manager = server.ConnectionManager()
+    results = {"latency": [], "ttft": []}
+    stats = {"frames": 0, "bytes": 0}
+    lags = []
+
+    if name == "direct":
+        jobs = [direct_client(n, args, results, stats) for n in range(args.clients)]
+    elif name == "chatroom":
+        sizes = [args.room_size] * (args.clients // args.room_size)
+        if args.clients % args.room_size:
+            sizes.append(args.clients % args.room_size)
+        jobs = [chatroom_group(g, size, args, results, stats) for g, size in enumerate(sizes)]
+    else:
+        jobs = [debate_client(n, args, results, stats) for n in range(args.clients)]
+
+    monitor = asyncio.create_task(loop_lag_monitor(lags))
+    start = time.perf_counter()
+    await asyncio.wait_for(asyncio.gather(*jobs), args.timeout)
+    elapsed = time.perf_counter() - start
+    monitor.cancel()
+
+    return results, stats, lags, elapsed
+
+
+# ============================================================
+# REPORT
+# ============================================================
+
+def percentiles(values):
+    values = [v for v in values if v is not None]
+    if not values:
+        return "n/a"
+    if len(values) == 1:
+        return f"p50 {values[0] * 1000:8.1f}ms"
+    q = statistics.quantiles(values, n=100, method="inclusive")
+    return f"p50 {q[49] * 1000:8.1f}ms  p95 {q[94] * 1000:8.1f}ms  p99 {q[98] * 1000:8.1f}ms"
+
+
+def report(name, results, stats, lags, elapsed):
+    count = len(results["latency"])
+    unit = "debates" if name == "debate" else "replies"
+    print(f"{name}: {count} {unit} in {elapsed:.2f}s -> {count / elapsed:.1f} {unit}/s, "
+          f"{stats['frames'] / elapsed:.0f} frames/s delivered")
+    print(f"    received  {stats['bytes'] / 1024:.0f} KiB, {stats['bytes'] / max(count, 1) / 1024:.1f} KiB per {unit[:-1] if name == 'debate' else 'reply'}")
+    print(f"    latency   {percentiles(results['latency'])}")
+    if name != "debate":
+        print(f"    ttft      {percentiles(results['ttft'])}")
+    print(f"    loop lag  {percentiles(lags)}  max {max(lags, default=0) * 1000:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent WebSocket load against /ws with a stub provider")
+    parser.add_argument("--scenario", choices=["direct", "chatroom", "debate", "all"], default="all")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=3, help="messages (or debates) per client")
+    parser.add_argument("--think", type=float, default=0.0, help="client pause between messages (s)")
+    parser.add_argument("--room-size", type=int, default=5, help="members per chatroom")
+    parser.add_argument("--debaters", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--ttft", type=float, default=0.1, help="stub time to first token (s)")
+    parser.add_argument("--tokens", type=int, default=20, help="stub tokens per reply")
+    parser.add_argument("--token-latency", type=float, default=0.005, help="stub delay between tokens (s)")
+    parser.add_argument("--no-stream", action="store_true", help="send replies as one message")
+    parser.add_argument("--frames", choices=["text", "deflate"], default="text", help="frame protocol to connect with")
+    parser.add_argument("--timeout", type=float, default=300.0, help="abort a scenario after this long (s)")
+    args = parser.parse_args()
+
+    install_stubs(args)
+    scenarios = ["direct", "chatroom", "debate"] if args.scenario == "all" else [args.scenario]
+    for name in scenarios:
+        report(name, *asyncio.run(run_scenario(name, args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+# ============================================================
+# broadcast.py — serialize-once fan-out with per-socket queues
+#
+# Frame formats, picked per socket when it connects:
+#
+#   text (default)       one JSON text frame per message
+#   binary               subprotocol "agora.deflate-json" (or ?frames=deflate):
+#                        one binary frame per message, first byte 0 = UTF-8
+#                        JSON follows, 1 = raw-DEFLATE'd UTF-8 JSON follows
+#                        (only for frames of WS_COMPRESS_MIN bytes or more)
+#
+# Binary frames are compressed once per broadcast and shared by every
+# recipient, unlike permessage-deflate, which compresses per socket.
+# ============================================================
+
+import asyncio
+import json
+import os
+import time
+import zlib
+from collections import deque
+from urllib.parse import parse_qs
+
+from fastapi import WebSocket
+
+from metrics import BROADCAST_RECIPIENTS, BROADCAST_SECONDS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_broadcast_seconds = BROADCAST_SECONDS.labels()
+
+
+OUTBOX_SIZE = int(os.getenv("BROADCAST_QUEUE_SIZE", "256"))
+SLOW_CONSUMER_POLICY = os.getenv("BROADCAST_SLOW_POLICY", "drop")  # "drop" | "disconnect"
+
+DROP = "drop"
+DISCONNECT = "disconnect"
+
+WS_COMPRESS_MIN = int(os.getenv("WS_COMPRESS_MIN", "256"))    # smaller frames are sent uncompressed
+WS_COMPRESS_LEVEL = int(os.getenv("WS_COMPRESS_LEVEL", "6"))
+
+TEXT_PROTOCOL = "agora.json"
+BINARY_PROTOCOL = "agora.deflate-json"
+FRAME_PROTOCOLS = {TEXT_PROTOCOL: False, BINARY_PROTOCOL: True}  # subprotocol -> binary frames
+
+RAW = b"\x00"
+DEFLATED = b"\x01"
+
+
+# ------------------------ FRAME ENCODING ------------------------
+_json_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def dumps(message) -> str:
+    """Compact JSON; orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(message).decode()
+    return _json_encoder.encode(message)
+
+
+def pack(frame: str) -> bytes:
+    """A text frame as a binary-protocol frame."""
+    data = frame.encode()
+    if len(data) < WS_COMPRESS_MIN:
+        return RAW + data
+    compressor = zlib.compressobj(WS_COMPRESS_LEVEL, zlib.DEFLATED, -15)
+    packed = compressor.compress(data) + compressor.flush()
+    return DEFLATED + packed if len(packed) < len(data) else RAW + data
+
+
+def unpack(frame: bytes) -> str:
+    if frame[:1] == DEFLATED:
+        return zlib.decompress(frame[1:], -15).decode()
+    return frame[1:].decode()
+
+
+def negotiate(scope) -> tuple[str | None, bool]:
+    """(subprotocol to accept with, binary frames?) from the client's offer, then ?frames=."""
+    for protocol in scope.get("subprotocols") or ():
+        if protocol in FRAME_PROTOCOLS:
+            return protocol, FRAME_PROTOCOLS[protocol]
+    query = parse_qs(scope.get("query_string", b"").decode())
+    return None, query.get("frames", [""])[0] == "deflate"
+
+
+def droppable(message) -> bool:
+    """Stream deltas may be lost under load (the "end" frame carries the full text); nothing else may."""
+    return message.get("type") == "delta"
+
+
+class Outbox:
+    """
+    Bounded queue of encoded frames for one socket, drained by its own task.
+    A slow socket only ever fills its own queue.
+    """
+
+    __slots__ = ("websocket", "binary", "size", "frames", "ready", "space", "task", "dropped", "closed")
+
+    def __init__(self, websocket: WebSocket, size: int, binary: bool = False):
+        self.websocket = websocket
+        self.binary = binary
+        self.size = size
+        self.frames = deque()           # (frame, droppable)
+        self.ready = asyncio.Event()    # frames are waiting
+        self.space = asyncio.Event()    # fewer than `size` are
+        self.space.set()
+        self.task = None
+        self.dropped = 0
+        self.closed = False
+
+    def full(self) -> bool:
+        return len(self.frames) >= self.size
+
+    def put(self, frame, can_drop=False):
+        self.frames.append((frame, can_drop))
+        self.ready.set()
+        if self.full():
+            self.space.clear()
+
+    async def get(self):
+        while not self.frames:
+            self.ready.clear()
+            await self.ready.wait()
+        frame, _ = self.frames.popleft()
+        if not self.full():
+            self.space.set()
+        return frame
+
+    def drop_oldest_droppable(self) -> bool:
+        for i, (_, can_drop) in enumerate(self.frames):
+            if can_drop:
+                del self.frames[i]
+                self.dropped += 1
+                return True
+        return False
+
+
+class Broadcaster:
+    """
+    Encodes each message once and hands the same frame to every recipient's
+    Outbox, so publishing never waits on any socket and sends to different
+    sockets proceed concurrently.
+
+    When a socket's queue is full, the `policy` decides:
+      "drop"       — discard that socket's oldest queued stream delta
+                     (streamed replies still end with a full-text "end"
+                     frame); other frames are never dropped, so a socket
+                     whose queue is all of them is closed as a slow consumer
+      "disconnect" — close the socket as a slow consumer
+    Sockets whose send fails are closed and reported through `on_close`.
+    """
+
+    def __init__(self, queue_size=OUTBOX_SIZE, policy=SLOW_CONSUMER_POLICY, on_close=None):
+        if policy not in (DROP, DISCONNECT):
+            raise ValueError(f"Unknown slow consumer policy: {policy}")
+        self.queue_size = queue_size
+        self.policy = policy
+        self.on_close = on_close
+        self._outboxes: dict[WebSocket, Outbox] = {}
+        self._closing = set()  # keeps close tasks alive until they finish
+
+        self.frames_sent = 0
+        self.frames_packed = 0
+        self.packed_bytes = 0       # binary-protocol bytes produced ...
+        self.unpacked_bytes = 0     # ... and the JSON bytes they stand for
+        self.frames_dropped = 0
+        self.slow_disconnects = 0
+
+    def __len__(self):
+        return len(self._outboxes)
+
+    def register(self, websocket: WebSocket, binary: bool = False):
+        outbox = Outbox(websocket, self.queue_size, binary)
+        outbox.task = asyncio.create_task(self._pump(outbox))
+        self._outboxes[websocket] = outbox
+
+    def unregister(self, websocket: WebSocket):
+        outbox = self._outboxes.pop(websocket, None)
+        if outbox is not None:
+            outbox.closed = True
+            outbox.space.set()  # wakes send_wait callers, which then see `closed`
+            if outbox.task is not asyncio.current_task():
+                outbox.task.cancel()
+
+    # ---------------- publishing ----------------
+    @staticmethod
+    def encode(message) -> str:
+        return dumps(message)
+
+    def _pack(self, frame: str) -> bytes:
+        packed = pack(frame)
+        self.frames_packed += 1
+        self.packed_bytes += len(packed)
+        self.unpacked_bytes += len(frame)
+        return packed
+
+    def publish(self, websockets, message):
+        """Queue `message` for every socket in `websockets`; never blocks."""
+        start = time.perf_counter()
+        frame = self.encode(message)
+        can_drop = droppable(message)
+        packed = None  # binary frame, built on first binary-protocol recipient
+        recipients = 0
+        # Copy: the disconnect policy can remove sockets from a room mid-loop
+        for websocket in tuple(websockets):
+            outbox = self._outboxes.get(websocket)
+            if outbox is not None:
+                if outbox.binary:
+                    if packed is None:
+                        packed = self._pack(frame)
+                    self._offer(outbox, packed, can_drop)
+                else:
+                    self._offer(outbox, frame, can_drop)
+                recipients += 1
+        BROADCAST_RECIPIENTS.inc(recipients)
+        _broadcast_seconds.observe(time.perf_counter() - start)
+
+    def send(self, websocket: WebSocket, message):
+        self.publish((websocket,), message)
+
+    async def send_wait(self, websocket: WebSocket, message):
+        """Like `send`, but waits for room in the outbox instead of dropping (bulk senders, e.g. replay)."""
+        outbox = self._outboxes.get(websocket)
+        if outbox is not None and not outbox.closed:
+            frame = self.encode(message)
+            while outbox.full() and not outbox.closed:
+                await outbox.space.wait()
+            if not outbox.closed:
+                outbox.put(self._pack(frame) if outbox.binary else frame)
+
+    def _offer(self, outbox: Outbox, frame, can_drop=False):
+        if outbox.closed:
+            return
+        if not outbox.full():
+            outbox.put(frame, can_drop)
+            return
+
+        if self.policy == DROP and outbox.drop_oldest_droppable():
+            outbox.put(frame, can_drop)
+            self.frames_dropped += 1
+        elif self.policy == DROP and can_drop:
+            outbox.dropped += 1  # nothing older to drop: this delta goes instead
+            self.frames_dropped += 1
+        else:
+            self.slow_disconnects += 1
+            self._detach(outbox)
+            task = asyncio.create_task(self._close_socket(outbox.websocket, 1008, "slow consumer"))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+
+    # ---------------- per-socket senders ----------------
+    async def _pump(self, outbox: Outbox):
+        while True:
+            frame = await outbox.get()
+            try:
+                if outbox.binary:
+                    await outbox.websocket.send_bytes(frame)
+                else:
+                    await outbox.websocket.send_text(frame)
+            except Exception:
+                self._detach(outbox)
+                await self._close_socket(outbox.websocket, 1011, "send failed")
+                return
+            self.frames_sent += 1
+
+    def _detach(self, outbox: Outbox):
+        self.unregister(outbox.websocket)
+        if self.on_close is not None:
+            self.on_close(outbox.websocket)
+
+    @staticmethod
+    async def _close_socket(websocket: WebSocket, code, reason):
+        try:
+            await websocket.close(code=code, reason=reason)
+        except Exception:
+            pass  # already gone
+
+    def stats(self) -> dict:
+        return {
+            "sockets": len(self._outboxes),
+            "queued_frames": sum(len(o.frames) for o in list(self._outboxes.values())),
+            "frames_sent": self.frames_sent,
+            "frames_packed": self.frames_packed,
+            "packed_bytes": self.packed_bytes,
+            "unpacked_bytes": self.unpacked_bytes,
+            "frames_dropped": self.frames_dropped,
+            "slow_disconnects": self.slow_disconnects,
+        }
@@ -0,0 +1,252 @@
+# ============================================================
+# bus.py — room broadcast / room state bus between workers
+#
+# LocalBus keeps everything in-process (one worker). SocketBus talks
+# to a small broker over a Unix or TCP socket so several uvicorn
+# workers, or several hosts, share rooms:
+#
+#   python bus.py --listen unix:///tmp/agora.sock
+#   BUS_URL=unix:///tmp/agora.sock python main.py --workers 4
+# ============================================================
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import uuid
+from urllib.parse import urlparse
+
+
+BUS_URL = os.getenv("BUS_URL", "local")
+BUS_MAX_BUFFER = int(os.getenv("BUS_MAX_BUFFER", str(8 * 1024 * 1024)))  # bytes a worker may fall behind
+
+
+# ============================================================
+# IN-PROCESS
+# ============================================================
+
+class LocalBus:
+    """
+    Single-process bus: publish delivers straight to `on_message`, room
+    state lives in a dict.
+    """
+
+    def __init__(self):
+        self.on_message = None  # callback(room_id, message, remote)
+        self._state = {}
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def publish(self, room_id, message):
+        self.on_message(room_id, message, False)
+
+    async def set(self, key, value):
+        self._state[key] = value
+
+    async def get(self, key):
+        return self._state.get(key)
+
+    async def incr(self, key, amount=1) -> int:
+        """Atomically add `amount` (default one) to a counter and return its previous value."""
+        value = self._state.get(key, 0)
+        self._state[key] = value + amount
+        return value
+
+    async def delete(self, *keys):
+        for key in keys:
+            self._state.pop(key, None)
+
+
+# ============================================================
+# NETWORK
+# ============================================================
+
+async def _open_connection(url):
+    parsed = urlparse(url)
+    if parsed.scheme == "unix":
+        return await asyncio.open_unix_connection(parsed.path)
+    if parsed.scheme == "tcp":
+        return await asyncio.open_connection(parsed.hostname, parsed.port)
+    raise ValueError(f"Unsupported bus url: {url}")
+
+
+class SocketBus:
+    """
+    Client for the broker below. One connection per worker carries
+    newline-delimited JSON both ways: requests with an "id" get a reply
+    with the same id; everything else the broker sends is a room
+    broadcast, delivered to `on_message` with `remote` set when another
+    worker published it.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.on_message = None
+        self.origin = uuid.uuid4().hex
+        self._reader = None
+        self._writer = None
+        self._reader_task = None
+        self._pending = {}
+        self._ids = itertools.count()
+        self._connect_lock = asyncio.Lock()
+
+    async def start(self):
+        async with self._connect_lock:
+            if self._writer is not None:
+                return
+            self._reader, self._writer = await _open_connection(self.url)
+            self._reader_task = asyncio.create_task(self._read_loop())
+            await self._send({"op": "sub"})
+
+    async def stop(self):
+        if self._writer is None:
+            return
+        self._reader_task.cancel()
+        self._writer.close()
+        self._writer = None
+
+    async def _send(self, frame):
+        self._writer.write(json.dumps(frame).encode() + b"\n")
+        await self._writer.drain()
+
+    async def _request(self, frame):
+        await self.start()
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        await self._send({**frame, "id": request_id})
+        return await future
+
+    async def _read_loop(self):
+        try:
+            while line := await self._reader.readline():
+                frame = json.loads(line)
+                if "id" in frame:
+                    future = self._pending.pop(frame["id"], None)
+                    if future is not None and not future.done():
+                        future.set_result(frame.get("value"))
+                else:
+                    self.on_message(frame["room"], frame["msg"], frame.get("origin") != self.origin)
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("bus connection lost"))
+            self._pending.clear()
+            self._writer = None
+
+    async def publish(self, room_id, message):
+        await self.start()
+        await self._send({"op": "pub", "room": room_id, "msg": message, "origin": self.origin})
+
+    async def set(self, key, value):
+        await self._request({"op": "set", "key": key, "value": value})
+
+    async def get(self, key):
+        return await self._request({"op": "get", "key": key})
+
+    async def incr(self, key, amount=1) -> int:
+        return await self._request({"op": "incr", "key": key, "amount": amount})
+
+    async def delete(self, *keys):
+        await self._request({"op": "del", "keys": list(keys)})
+
+
+def bus_from_env():
+    """BUS_URL=local (default), unix:///path/to.sock or tcp://host:port."""
+    if BUS_URL == "local":
+        return LocalBus()
+    return SocketBus(BUS_URL)
+
+
+# ============================================================
+# BROKER
+# ============================================================
+
+class Broker:
+    """
+    Fans out room broadcasts to every subscribed worker and holds room state.
+
+    Broadcasts are written without waiting on subscribers. A worker with more
+    than `max_buffer` bytes still unsent is disconnected rather than buffered
+    for without limit; it resubscribes on its next bus call.
+    """
+
+    def __init__(self, max_buffer=BUS_MAX_BUFFER):
+        self.subscribers = set()
+        self.state = {}
+        self.max_buffer = max_buffer
+        self.dropped = 0
+
+    async def handle(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                frame = json.loads(line)
+                op = frame.get("op")
+
+                if op == "sub":
+                    self.subscribers.add(writer)
+                elif op == "pub":
+                    data = json.dumps({"room": frame["room"], "msg": frame["msg"], "origin": frame.get("origin")}).encode() + b"\n"
+                    for subscriber in list(self.subscribers):
+                        subscriber.write(data)
+                        if subscriber.transport.get_write_buffer_size() > self.max_buffer:
+                            self._drop(subscriber)
+                elif op == "set":
+                    self.state[frame["key"]] = frame["value"]
+                    self._reply(writer, frame["id"], None)
+                elif op == "get":
+                    self._reply(writer, frame["id"], self.state.get(frame["key"]))
+                elif op == "incr":
+                    value = self.state.get(frame["key"], 0)
+                    self.state[frame["key"]] = value + frame.get("amount", 1)
+                    self._reply(writer, frame["id"], value)
+                elif op == "del":
+                    for key in frame["keys"]:
+                        self.state.pop(key, None)
+                    self._reply(writer, frame["id"], None)
+
+                await writer.drain()
+        except (ConnectionError, json.JSONDecodeError):
+            pass
+        finally:
+            self.subscribers.discard(writer)
+            writer.close()
+
+    def _drop(self, subscriber):
+        self.subscribers.discard(subscriber)
+        self.dropped += 1
+        subscriber.transport.abort()  # close() would wait to flush what it is behind on
+        print("Bus subscriber dropped: more than", self.max_buffer, "bytes behind")
+
+    @staticmethod
+    def _reply(writer, request_id, value):
+        writer.write(json.dumps({"id": request_id, "value": value}).encode() + b"\n")
+
+
+async def serve(url):
+    broker = Broker()
+    parsed = urlparse(url)
+    if parsed.scheme == "unix":
+        if os.path.exists(parsed.path):
+            os.unlink(parsed.path)
+        server = await asyncio.start_unix_server(broker.handle, path=parsed.path)
+    elif parsed.scheme == "tcp":
+        server = await asyncio.start_server(broker.handle, parsed.hostname, parsed.port)
+    else:
+        raise ValueError(f"Unsupported bus url: {url}")
+
+    print("Bus broker listening on", url)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AgoraAI room bus broker")
+    parser.add_argument("--listen", default="unix:///tmp/agora.sock", help="unix:///path or tcp://host:port")
+    args = parser.parse_args()
+    asyncio.run(serve(args.listen))
@@ -0,0 +1,98 @@
+# ============================================================
+# context.py — token-budgeted conversation context per room
+# ============================================================
+
+import os
+import re
+from collections import deque
+
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_SUMMARY_BUDGET = int(os.getenv("CONTEXT_SUMMARY_BUDGET", "300"))
+CONTEXT_MAX_TURNS = int(os.getenv("CONTEXT_MAX_TURNS", "64"))
+
+SUMMARY_LINE_CHARS = 160
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def count_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token); no tokenizer needed."""
+    return (len(text) + 3) // 4
+
+
+def summarize_turn(author: str, text: str) -> str:
+    """One summary line for a turn: its first sentence, clipped."""
+    first = _SENTENCE_END.split(text.strip(), maxsplit=1)[0]
+    if len(first) > SUMMARY_LINE_CHARS:
+        first = first[:SUMMARY_LINE_CHARS - 3].rstrip() + "..."
+    return f"{author}: {first}"
+
+
+class RoomContext:
+    """
+    Recent turns in a ring buffer plus a rolling summary of older ones.
+
+    Turns are kept verbatim while their token total fits `budget`; beyond
+    that the oldest turns are folded into the summary, which is itself
+    capped at `summary_budget` tokens by dropping its oldest lines. The
+    rendered summary is cached until the next fold, so a prompt never
+    costs more than budget + summary_budget tokens however long the room
+    runs.
+    """
+
+    __slots__ = ("budget", "summary_budget", "turns", "tokens",
+                 "summary_lines", "summary_tokens", "_summary_text")
+
+    def __init__(self, budget=CONTEXT_TOKEN_BUDGET, summary_budget=CONTEXT_SUMMARY_BUDGET,
+                 max_turns=CONTEXT_MAX_TURNS):
+        self.budget = budget
+        self.summary_budget = summary_budget
+        self.turns = deque(maxlen=max_turns)  # (author, text, tokens)
+        self.tokens = 0
+        self.summary_lines = deque()          # (line, tokens)
+        self.summary_tokens = 0
+        self._summary_text = ""
+
+    def __len__(self):
+        return len(self.turns)
+
+    def add(self, author: str, text: str):
+        if len(self.turns) == self.turns.maxlen:
+            self._fold(self.turns.popleft())
+
+        tokens = count_tokens(text)
+        self.turns.append((author, text, tokens))
+        self.tokens += tokens
+
+        # Always keep the newest turn, even if it alone exceeds the budget
+        while self.tokens > self.budget and len(self.turns) > 1:
+            self._fold(self.turns.popleft())
+
+    def _fold(self, turn):
+        author, text, tokens = turn
+        self.tokens -= tokens
+
+        line = summarize_turn(author, text)
+        line_tokens = count_tokens(line)
+        self.summary_lines.append((line, line_tokens))
+        self.summary_tokens += line_tokens
+
+        while self.summary_tokens > self.summary_budget and len(self.summary_lines) > 1:
+            _, dropped = self.summary_lines.popleft()
+            self.summary_tokens -= dropped
+
+        self._summary_text = "\n".join(line for line, _ in self.summary_lines)
+
+    @property
+    def summary(self) -> str:
+        return self._summary_text
+
+    def render(self) -> str:
+        parts = []
+        if self._summary_text:
+            parts.append(f"Earlier in the conversation (summary):\n{self._summary_text}")
+        if self.turns:
+            recent = "\n\n".join(f"{author}: {text}" for author, text, _ in self.turns)
+            parts.append(f"Recent messages:\n{recent}")
+        return "\n\n".join(parts)
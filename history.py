@@ -0,0 +1,67 @@
+# ============================================================
+# history.py — keyset-paginated chatroom history
+# ============================================================
+
+import base64
+from datetime import datetime
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+
+from models import ChatroomLog
+
+
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Raises ValueError for anything that is not a cursor we issued."""
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception as exc:
+        raise ValueError("invalid cursor") from exc
+
+
+def room_history(db: Session, chatroom_id: str, limit: int = 50, before: str | None = None) -> dict:
+    """
+    One page of a room's messages, oldest first, ending just before `before`
+    (or at the newest message). Seeks on the (chatroom_id, created_at, id)
+    index, so every page costs the same regardless of how deep it is.
+    `next_cursor` fetches the page of older messages; None when exhausted.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    query = select(ChatroomLog).where(ChatroomLog.chatroom_id == chatroom_id)
+    if before:
+        query = query.where(
+            tuple_(ChatroomLog.created_at, ChatroomLog.id) < tuple_(*decode_cursor(before))
+        )
+    query = query.order_by(ChatroomLog.created_at.desc(), ChatroomLog.id.desc()).limit(limit + 1)
+
+    rows = list(db.scalars(query))
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
+    rows.reverse()
+
+    return {
+        "chatroom_id": chatroom_id,
+        "messages": [
+            {
+                "id": row.id,
+                "role": row.role,
+                "author": row.ai_name if row.role == "ai" else "User",
+                "content": row.message,
+                "created_at": row.created_at.isoformat(),
+            }
+            for row in rows
+        ],
+        "next_cursor": next_cursor,
+    }
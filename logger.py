@@ -1,9 +1,164 @@
-from sqlalchemy.orm import Session
-from models import MessageLog
-
-def log_message(db: Session, sender: str, agent_name: str, content: str|None=None):
-    """Logs a message to the database."""
-    message = MessageLog(sender=sender, agent=agent_name, content=content)
-    db.add(message)
-    db.commit()
-   
\ No newline at end of file
+import asyncio
+import os
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from database import SessionLocal
+from metrics import DB_ROWS, DB_WRITE_SECONDS
+from models import ChatLog
+
+
+# ------------------------ BATCHED LOG WRITER ------------------------
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "200"))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "0.05"))
+
+_STOP = object()
+
+
+class LogWriter:
+    """
+    Background writer for chat log rows.
+
+    Handlers enqueue rows with `await write(Model, **fields)` and return
+    immediately. A single task drains the bounded queue and group-commits
+    rows as bulk INSERTs once `batch_size` rows are waiting or
+    `flush_interval` seconds have passed, running the DB work in a thread
+    so the event loop never waits on the database. When the queue is full,
+    `write` waits for room (backpressure) instead of growing without bound.
+    """
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        max_queue=LOG_QUEUE_SIZE,
+        batch_size=LOG_BATCH_SIZE,
+        flush_interval=LOG_FLUSH_INTERVAL,
+    ):
+        self.session_factory = session_factory
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue = None
+        self._task = None
+
+        self.enqueued = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.producer_waits = 0
+        self.max_queue_depth = 0
+        self.last_batch_size = 0
+        self.last_flush_seconds = 0.0
+
+    # ---------------- lifecycle ----------------
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything still queued, then stop the writer task."""
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        self._queue = None
+
+    # ---------------- producers ----------------
+    async def write(self, model, **fields):
+        self.start()
+        fields.setdefault("created_at", datetime.utcnow())
+
+        if self._queue.full():
+            self.producer_waits += 1
+        await self._queue.put((model, fields))
+
+        self.enqueued += 1
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_capacity": self.max_queue,
+            "max_queue_depth": self.max_queue_depth,
+            "producer_waits": self.producer_waits,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches,
+            "last_batch_size": self.last_batch_size,
+            "last_flush_seconds": self.last_flush_seconds,
+        }
+
+    # ---------------- consumer ----------------
+    async def _next_batch(self):
+        """Block for one row, then collect more until the batch is full or the window closes."""
+        batch = [await self._queue.get()]
+        if batch[0] is _STOP:
+            return [], True
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+
+        while len(batch) < self.batch_size:
+            if self._queue.empty():
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                item = self._queue.get_nowait()
+
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+
+        return batch, False
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._next_batch()
+            if batch:
+                await asyncio.to_thread(self._flush, batch)
+
+    def _flush(self, batch):
+        rows_by_model = {}
+        for model, fields in batch:
+            rows_by_model.setdefault(model, []).append(fields)
+
+        start = time.perf_counter()
+        db = self.session_factory()
+        try:
+            for model, rows in rows_by_model.items():
+                db.execute(insert(model), rows)
+            db.commit()
+            self.written += len(batch)
+            DB_ROWS.inc(len(batch))
+        except Exception as exc:
+            db.rollback()
+            self.failed += len(batch)
+            print("Log writer dropped", len(batch), "rows:", exc)
+        finally:
+            db.close()
+
+        self.batches += 1
+        self.last_batch_size = len(batch)
+        self.last_flush_seconds = time.perf_counter() - start
+        DB_WRITE_SECONDS.observe(self.last_flush_seconds)
+
+
+log_writer = LogWriter()
+
+
+async def log_message(sender: str, agent_name: str | None, content: str | None = None):
+    """Queues a chat message for the background log writer."""
+    await log_writer.write(ChatLog, role=sender, content=content, ai_name=agent_name)
@@ -1,5 +1,29 @@
+import argparse
+import os
+
 import uvicorn
 
 if __name__ == "__main__":
-    uvicorn.run("app.app:app", host="0.0.0.0", port=8000,reload=True)
-    
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the AgoraAI server")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")))
+    parser.add_argument("--reload", action="store_true", help="auto-reload on code changes (single worker)")
+    parser.add_argument(
+        "--no-ws-deflate", action="store_true",
+        help="turn off per-socket permessage-deflate (clients on agora.deflate-json frames are already compressed)",
+    )
+    args = parser.parse_args()
+
+    # Workers only share rooms through a network bus (see bus.py)
+    if args.workers > 1 and os.getenv("BUS_URL", "local") == "local":
+        print("WARNING: --workers > 1 with BUS_URL=local; each worker will have its own rooms.")
+
+    if args.reload:
+        # Pick up edits to the frontend files too (see static.py)
+        os.environ.setdefault("STATIC_RELOAD", "1")
+        uvicorn.run("app.app:app", host=args.host, port=args.port, reload=True,
+                    ws_per_message_deflate=not args.no_ws_deflate)
+    else:
+        uvicorn.run("app.app:app", host=args.host, port=args.port, workers=args.workers,
+                    ws_per_message_deflate=not args.no_ws_deflate)
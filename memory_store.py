@@ -0,0 +1,194 @@
+# ============================================================
+# memory_store.py — persona memory backends
+# ============================================================
+
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+
+from sqlalchemy import delete, select
+
+
+MEMORY_LIMIT = int(os.getenv("MEMORY_LIMIT", "20"))      # facts kept per (persona, scope)
+MEMORY_TOP_K = int(os.getenv("MEMORY_TOP_K", "5"))       # facts injected per prompt
+MEMORY_CACHE_TTL = float(os.getenv("MEMORY_CACHE_TTL", "5"))
+MEMORY_CACHE_SIZE = int(os.getenv("MEMORY_CACHE_SIZE", "1024"))  # (persona, scope) keys cached per process
+
+GLOBAL_SCOPE = "*"  # memory not tied to a room or user
+
+_WORD = re.compile(r"[a-z0-9']+")
+
+
+# ============================================================
+# RELEVANCE
+# ============================================================
+
+def _tokens(text):
+    return _WORD.findall(text.lower())
+
+
+def rank_facts(facts, query, k=MEMORY_TOP_K):
+    """
+    The `k` facts most relevant to `query` by TF-IDF cosine similarity,
+    returned in their original (oldest first) order. Ties go to newer facts.
+    """
+    if len(facts) <= k:
+        return list(facts)
+
+    query_words = set(_tokens(query))
+    if not query_words:
+        return list(facts[-k:])
+
+    docs = [Counter(_tokens(fact)) for fact in facts]
+    df = Counter(word for doc in docs for word in doc)
+    n = len(docs)
+    idf = {word: math.log((1 + n) / (1 + count)) + 1 for word, count in df.items()}
+
+    scores = []
+    for i, doc in enumerate(docs):
+        norm = math.sqrt(sum((tf * idf[w]) ** 2 for w, tf in doc.items())) or 1.0
+        score = sum(doc[w] * idf[w] * idf[w] for w in query_words if w in doc) / norm
+        scores.append((score, i))
+
+    top = sorted(scores, reverse=True)[:k]
+    return [facts[i] for i in sorted(i for _, i in top)]
+
+
+# ============================================================
+# BACKENDS
+# ============================================================
+
+class InMemoryStore:
+    """Per-process store: one bounded deque per (persona, scope)."""
+
+    blocking = False
+
+    def __init__(self, limit=MEMORY_LIMIT):
+        self.limit = limit
+        self._facts: dict[tuple[str, str], deque] = {}
+
+    def remember(self, persona, scope, fact):
+        key = (persona, scope)
+        facts = self._facts.get(key)
+        if facts is None:
+            facts = self._facts[key] = deque(maxlen=self.limit)
+        facts.append(fact)
+
+    def facts(self, persona, scope) -> list[str]:
+        return list(self._facts.get((persona, scope), ()))
+
+    def forget(self, persona, scope):
+        self._facts.pop((persona, scope), None)
+
+    def drop_cached(self, scope):
+        pass  # nothing cached: the deques are the data
+
+
+class SqlMemoryStore:
+    """
+    Store shared by every worker through the app database (sqlite or
+    postgres). Reads go through a short per-process cache, refreshed after
+    MEMORY_CACHE_TTL seconds or when this process writes to that key, and
+    holding at most `cache_size` keys (least recently used go first).
+    Empty results are not cached.
+    """
+
+    blocking = True  # database I/O: call from a worker thread on the event loop
+
+    def __init__(
+        self, session_factory=None, limit=MEMORY_LIMIT, cache_ttl=MEMORY_CACHE_TTL, cache_size=MEMORY_CACHE_SIZE
+    ):
+        # Imported here so the in-memory backend never touches the database
+        from database import SessionLocal
+        from models import PersonaMemory
+
+        self.model = PersonaMemory
+        self.session_factory = session_factory or SessionLocal
+        self.limit = limit
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._cache: OrderedDict[tuple[str, str], tuple[float, list[str]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def remember(self, persona, scope, fact):
+        PersonaMemory = self.model
+        db = self.session_factory()
+        try:
+            db.add(PersonaMemory(persona=persona, scope=scope, fact=fact))
+            db.flush()
+            # Trim to the newest `limit` facts for this key
+            keep = (
+                select(PersonaMemory.id)
+                .where(PersonaMemory.persona == persona, PersonaMemory.scope == scope)
+                .order_by(PersonaMemory.id.desc())
+                .limit(self.limit)
+            )
+            db.execute(
+                delete(PersonaMemory)
+                .where(PersonaMemory.persona == persona, PersonaMemory.scope == scope)
+                .where(PersonaMemory.id.not_in(keep.scalar_subquery()))
+            )
+            db.commit()
+        finally:
+            db.close()
+
+        with self._lock:
+            self._cache.pop((persona, scope), None)
+
+    def facts(self, persona, scope) -> list[str]:
+        key = (persona, scope)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] > now:
+                self._cache.move_to_end(key)
+                return cached[1]
+
+        PersonaMemory = self.model
+        db = self.session_factory()
+        try:
+            facts = list(db.scalars(
+                select(PersonaMemory.fact)
+                .where(PersonaMemory.persona == persona, PersonaMemory.scope == scope)
+                .order_by(PersonaMemory.id)
+            ))
+        finally:
+            db.close()
+
+        if facts:
+            with self._lock:
+                self._cache[key] = (now + self.cache_ttl, facts)
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return facts
+
+    def forget(self, persona, scope):
+        PersonaMemory = self.model
+        db = self.session_factory()
+        try:
+            db.execute(delete(PersonaMemory).where(
+                PersonaMemory.persona == persona, PersonaMemory.scope == scope
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+        with self._lock:
+            self._cache.pop((persona, scope), None)
+
+    def drop_cached(self, scope):
+        """Forget cached reads for a scope nobody uses any more (a closed room or session)."""
+        with self._lock:
+            for key in [key for key in self._cache if key[1] == scope]:
+                del self._cache[key]
+
+
+def store_from_env():
+    """MEMORY_BACKEND=memory (default) or sql."""
+    if os.getenv("MEMORY_BACKEND", "memory").lower() == "sql":
+        return SqlMemoryStore()
+    return InMemoryStore()
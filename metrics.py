@@ -0,0 +1,151 @@
+# ============================================================
+# metrics.py — in-process counters/histograms, Prometheus text format
+# ============================================================
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+FAST_BUCKETS = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 0.001, 0.005, 0.01, 0.05)
+
+_metrics = []
+_collectors = []  # (prefix, stats_fn)
+
+
+def _label_text(labelnames, values, extra=""):
+    pairs = [f'{k}="{v}"' for k, v in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter, one series per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        _metrics.append(self)
+
+    def inc(self, amount=1, *labels):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in list(self._values.items()):  # snapshot: worker threads add labels too
+            yield self.name + _label_text(self.labelnames, labels), value
+
+
+class _Series:
+    """One label combination of a histogram; `observe` is a bisect plus two adds."""
+
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram. Hot paths should bind their series once
+    with `labels(...)` and call its `observe` directly.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> _Series
+        _metrics.append(self)
+
+    def labels(self, *values) -> _Series:
+        series = self._series.get(values)
+        if series is None:
+            series = self._series[values] = _Series(self.buckets)
+        return series
+
+    def observe(self, value, *labels):
+        self.labels(*labels).observe(value)
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def samples(self):
+        for labels, series in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series.counts):
+                cumulative += count
+                yield self.name + "_bucket" + _label_text(self.labelnames, labels, f'le="{bound}"'), cumulative
+            yield self.name + "_sum" + _label_text(self.labelnames, labels), series.sum
+            yield self.name + "_count" + _label_text(self.labelnames, labels), cumulative
+
+
+def register_stats(prefix, stats_fn):
+    """Expose every numeric field of `stats_fn()` as `<prefix>_<field>`, read at scrape time."""
+    _collectors.append((prefix, stats_fn))
+
+
+def render() -> str:
+    lines = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(f"{name} {value}" for name, value in metric.samples())
+
+    for prefix, stats_fn in _collectors:
+        for field, value in stats_fn().items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f"# TYPE {prefix}_{field} untyped")
+                lines.append(f"{prefix}_{field} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# ============================================================
+# HOT-PATH METRICS
+# ============================================================
+
+PROMPT_BUILD_SECONDS = Histogram(
+    "agora_prompt_build_seconds", "System prompt construction time", buckets=FAST_BUCKETS
+)
+PROVIDER_TTFT_SECONDS = Histogram(
+    "agora_provider_ttft_seconds", "Provider time to first token (streamed replies)", ("persona",)
+)
+PROVIDER_SECONDS = Histogram(
+    "agora_provider_seconds", "Provider call time including scheduler wait", ("persona", "mode")
+)
+PROVIDER_ERRORS = Counter("agora_provider_errors_total", "Failed provider calls", ("persona",))
+TOKENS = Counter("agora_tokens_total", "Tokens reported by the provider's usage field", ("persona", "kind"))
+DB_WRITE_SECONDS = Histogram("agora_db_write_seconds", "Log batch insert + commit time")
+DB_ROWS = Counter("agora_db_rows_total", "Log rows written")
+BROADCAST_SECONDS = Histogram(
+    "agora_broadcast_seconds", "Encode + enqueue time for one broadcast", buckets=FAST_BUCKETS
+)
+BROADCAST_RECIPIENTS = Counter("agora_broadcast_recipients_total", "Frames handed to socket outboxes")
+
+
+def record_usage(persona, usage):
+    """Add a completion's `usage` (prompt/completion tokens) to the per-persona counters."""
+    if usage is None:
+        return
+    persona = persona or "-"
+    TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, persona, "prompt")
+    TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, persona, "completion")
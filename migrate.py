@@ -0,0 +1,114 @@
+"""
+Versioned schema migrations.
+
+    python migrate.py            # apply pending migrations
+    python migrate.py --status   # list applied / pending
+
+Applied versions are recorded in `schema_migrations`. Every step checks
+the live schema first, so databases created by create_tables.py (old or
+new models) can be brought up to date safely.
+"""
+
+import argparse
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, inspect, select, text
+
+from database import engine, Base
+import models  # noqa: F401  (registers tables on Base.metadata)
+
+
+_meta = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _meta,
+    Column("version", String(100), primary_key=True),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+# ------------------------ HELPERS ------------------------
+def _has_column(conn, table, column):
+    return any(c["name"] == column for c in inspect(conn).get_columns(table))
+
+
+def _has_index(conn, table, index):
+    return any(i["name"] == index for i in inspect(conn).get_indexes(table))
+
+
+def _create_index(conn, model, index_name):
+    index = next(i for i in model.__table__.indexes if i.name == index_name)
+    if not _has_index(conn, model.__tablename__, index_name):
+        index.create(conn)
+
+
+# ------------------------ MIGRATIONS ------------------------
+def m0001_initial(conn):
+    """Base tables as create_tables.py made them."""
+    Base.metadata.create_all(conn, checkfirst=True)
+
+
+def m0002_chat_log_session(conn):
+    table = models.ChatLog.__tablename__
+    if not _has_column(conn, table, "session_id"):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN session_id VARCHAR(64)"))
+    _create_index(conn, models.ChatLog, "ix_chat_logs01_session_created")
+
+
+def m0003_chatroom_history_index(conn):
+    _create_index(conn, models.ChatroomLog, "ix_chatroom_logs_room_created")
+
+
+def m0004_persona_memory(conn):
+    models.PersonaMemory.__table__.create(conn, checkfirst=True)
+    _create_index(conn, models.PersonaMemory, "ix_persona_memory_persona_scope")
+
+
+MIGRATIONS = [
+    ("0001_initial", m0001_initial),
+    ("0002_chat_log_session", m0002_chat_log_session),
+    ("0003_chatroom_history_index", m0003_chatroom_history_index),
+    ("0004_persona_memory", m0004_persona_memory),
+]
+
+
+# ------------------------ RUNNER ------------------------
+def applied_versions(conn) -> set[str]:
+    _meta.create_all(conn, checkfirst=True)
+    return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+
+def upgrade(bind=engine) -> list[str]:
+    """Apply pending migrations in order, each in its own transaction."""
+    with bind.begin() as conn:
+        done = applied_versions(conn)
+
+    applied = []
+    for version, step in MIGRATIONS:
+        if version in done:
+            continue
+        with bind.begin() as conn:
+            step(conn)
+            conn.execute(schema_migrations.insert().values(version=version, applied_at=datetime.utcnow()))
+        applied.append(version)
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply database schema migrations")
+    parser.add_argument("--status", action="store_true", help="show migration status only")
+    args = parser.parse_args()
+
+    if args.status:
+        with engine.begin() as conn:
+            done = applied_versions(conn)
+        for version, _ in MIGRATIONS:
+            print(("applied " if version in done else "pending ") + version)
+        return
+
+    applied = upgrade()
+    print("Applied: " + ", ".join(applied) if applied else "Database is up to date.")
+
+
+if __name__ == "__main__":
+    main()
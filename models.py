@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
 from datetime import datetime
 from database import Base
 
@@ -6,11 +6,16 @@ class ChatLog(Base):
     __tablename__ = "chat_logs01"
 
     id = Column(Integer, primary_key=True)
+    session_id = Column(String(64), nullable=True)  # one per WebSocket connection
     role = Column(String(10))       # "user" | "ai"
     content = Column(Text)
     ai_name = Column(String(50), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_chat_logs01_session_created", "session_id", "created_at", "id"),
+    )
+
 class ChatroomLog(Base):
     __tablename__ = "chatroom_logs"
 
@@ -19,4 +24,22 @@ class ChatroomLog(Base):
     ai_name=Column(String(50), nullable=True)
     chatroom_id = Column(String(100))
     message = Column(Text)
-    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Room history is read newest-first by (created_at, id) keyset
+    __table_args__ = (
+        Index("ix_chatroom_logs_room_created", "chatroom_id", "created_at", "id"),
+    )
+
+class PersonaMemory(Base):
+    __tablename__ = "persona_memory"
+
+    id = Column(Integer, primary_key=True)
+    persona = Column(String(50), nullable=False)
+    scope = Column(String(100), nullable=False)     # room id, session id or "*"
+    fact = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_persona_memory_persona_scope", "persona", "scope", "id"),
+    )
@@ -0,0 +1,97 @@
+# ============================================================
+# orchestrator.py — concurrent agent turns for debates/chatrooms
+# ============================================================
+
+import asyncio
+import os
+from dataclasses import dataclass
+
+from agents2 import call_persona_async
+
+
+# Turns of one round run at once; 0 = all of them
+MAX_CONCURRENCY = int(os.getenv("AGENT_MAX_CONCURRENCY", "0"))
+TURN_TIMEOUT = float(os.getenv("AGENT_TURN_TIMEOUT", "60"))
+
+
+@dataclass
+class TurnResult:
+    agent: str
+    reply: str | None
+    error: str | None = None
+
+
+# ============================================================
+# ORCHESTRATOR
+# ============================================================
+
+class Orchestrator:
+    """
+    Runs independent agent turns concurrently.
+
+    Each `fan_out` (one round of one debate) runs up to `max_concurrency`
+    of its turns at once, all of them by default, so rounds in different
+    rooms never wait on each other; process-wide provider limits are the
+    scheduler's job. Each turn gets `turn_timeout` seconds once it starts.
+    Results come back in the order the turns were given, so a round costs
+    about as much as its slowest agent instead of the sum of all of them.
+    """
+
+    def __init__(self, call=None, max_concurrency=MAX_CONCURRENCY, turn_timeout=TURN_TIMEOUT):
+        self.call = call or call_persona_async
+        self.max_concurrency = max_concurrency
+        self.turn_timeout = turn_timeout
+
+    async def run_turn(self, agent, prompt):
+        try:
+            reply = await asyncio.wait_for(self.call(agent, prompt), self.turn_timeout)
+        except asyncio.TimeoutError:
+            return TurnResult(agent, None, f"timed out after {self.turn_timeout:g}s")
+        except Exception as exc:
+            return TurnResult(agent, None, str(exc) or type(exc).__name__)
+        return TurnResult(agent, reply)
+
+    async def fan_out(self, turns):
+        """
+        Start the (agent, prompt) turns, up to `max_concurrency` at a time,
+        and yield TurnResults in input order, each as soon as it and all
+        turns before it are done.
+        """
+        turns = list(turns)
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrency or len(turns)))
+
+        async def bounded(agent, prompt):
+            async with semaphore:
+                return await self.run_turn(agent, prompt)
+
+        tasks = [asyncio.create_task(bounded(agent, prompt)) for agent, prompt in turns]
+        try:
+            for task in tasks:
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def run_round(self, turns):
+        return [result async for result in self.fan_out(turns)]
+
+
+# ============================================================
+# DEBATE PROMPTS
+# ============================================================
+
+def debate_prompt(agent_name, topic, round_no, rounds, transcript=""):
+    """Prompt for one agent's turn; `transcript` is the rendered debate context so far."""
+    prompt = (
+        f"Debate topic: {topic}\n"
+        f"Round {round_no} of {rounds}.\n\n"
+    )
+
+    if transcript:
+        prompt += f"The debate so far:\n{transcript}\n\n"
+
+    prompt += (
+        f"You are {agent_name}. Argue your position in a few short paragraphs"
+        + (" and respond to the other debaters' points." if transcript else ".")
+    )
+    return prompt
@@ -0,0 +1,116 @@
+# ============================================================
+# persona_loader.py — load and validate persona definitions
+#
+# One persona per file in PERSONA_DIR (default ./personas):
+#   CoderAI.json  or  CoderAI.yaml (YAML needs PyYAML installed)
+#
+#   {
+#     "name": "CoderAI",                 optional, defaults to the file name
+#     "role": "Senior Software Engineer",
+#     "traits": ["logical", "precise"],
+#     "tone": {"professionalism": 5, "humor": 1, "energy": 2, "complexity": 3},
+#     "style": {"examples": true, "bullets": true, "code": true, "metaphors": false},
+#     "rules": ["Use best practices."],
+#     "aliases": ["dev"],                optional, extra names users can type
+#     "models": ["groq:openai/gpt-oss-20b", "groq:llama-3.1-8b-instant"],
+#                                        optional, ordered fallbacks (default LLM_ROUTES)
+#     "cache": true                      optional, false = never cache replies
+#   }
+# ============================================================
+
+import json
+import os
+from pathlib import Path
+
+
+PERSONA_DIR = Path(os.getenv("PERSONA_DIR", Path(__file__).parent / "personas"))
+
+TONE_KEYS = ("professionalism", "humor", "energy", "complexity")
+STYLE_KEYS = ("examples", "bullets", "code", "metaphors")
+
+
+class PersonaError(ValueError):
+    """A persona definition is missing fields or has the wrong types."""
+
+
+def _string_list(name, data, key, required=True):
+    value = data.get(key, None if required else [])
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        raise PersonaError(f"{name}: '{key}' must be a list of strings")
+    return value
+
+
+def validate_persona(name, data) -> dict:
+    """Check a persona definition and return it normalized (unknown keys rejected)."""
+    if not isinstance(data, dict):
+        raise PersonaError(f"{name}: definition must be a mapping")
+
+    known = {"name", "role", "traits", "tone", "style", "rules", "aliases", "cache", "models"}
+    unknown = set(data) - known
+    if unknown:
+        raise PersonaError(f"{name}: unknown keys {sorted(unknown)}")
+
+    if not isinstance(data.get("role"), str) or not data["role"].strip():
+        raise PersonaError(f"{name}: 'role' must be a non-empty string")
+
+    tone = data.get("tone")
+    if not isinstance(tone, dict) or set(tone) != set(TONE_KEYS):
+        raise PersonaError(f"{name}: 'tone' needs exactly {', '.join(TONE_KEYS)}")
+    for key, value in tone.items():
+        if isinstance(value, bool) or not isinstance(value, int) or not 1 <= value <= 5:
+            raise PersonaError(f"{name}: tone '{key}' must be an integer from 1 to 5")
+
+    style = data.get("style")
+    if not isinstance(style, dict) or set(style) != set(STYLE_KEYS):
+        raise PersonaError(f"{name}: 'style' needs exactly {', '.join(STYLE_KEYS)}")
+    if not all(isinstance(v, bool) for v in style.values()):
+        raise PersonaError(f"{name}: 'style' values must be true/false")
+
+    if not isinstance(data.get("cache", True), bool):
+        raise PersonaError(f"{name}: 'cache' must be true/false")
+
+    persona = {
+        "role": data["role"],
+        "traits": _string_list(name, data, "traits"),
+        "tone": {k: tone[k] for k in TONE_KEYS},
+        "style": {k: style[k] for k in STYLE_KEYS},
+        "rules": _string_list(name, data, "rules"),
+    }
+    if "cache" in data:
+        persona["cache"] = data["cache"]
+    if "aliases" in data:
+        persona["aliases"] = _string_list(name, data, "aliases")
+    if "models" in data:
+        persona["models"] = _string_list(name, data, "models")
+    return persona
+
+
+def _read(path: Path):
+    if path.suffix == ".json":
+        return json.loads(path.read_text(encoding="utf-8"))
+    try:
+        import yaml
+    except ImportError:
+        raise PersonaError(f"{path.name}: install PyYAML to load YAML personas")
+    return yaml.safe_load(path.read_text(encoding="utf-8"))
+
+
+def load_personas(directory=PERSONA_DIR) -> dict:
+    """Read every *.json / *.yaml / *.yml file in `directory`, in file name order."""
+    directory = Path(directory)
+    if not directory.is_dir():
+        raise PersonaError(f"Persona directory not found: {directory}")
+
+    personas = {}
+    for path in sorted(directory.iterdir()):
+        if path.suffix not in (".json", ".yaml", ".yml"):
+            continue
+        data = _read(path)
+        name = data.get("name", path.stem) if isinstance(data, dict) else path.stem
+        if name in personas:
+            raise PersonaError(f"{path.name}: duplicate persona '{name}'")
+        personas[name] = validate_persona(name, data)
+
+    if not personas:
+        raise PersonaError(f"No persona files in {directory}")
+    return personas
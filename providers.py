@@ -0,0 +1,371 @@
+# ============================================================
+# providers.py — LLM provider interface
+#
+# A provider takes the keyword arguments of an OpenAI-style
+# chat.completions.create call and returns a completion, or an
+# iterator of chunks when stream=True:
+#
+#   create(**request)          blocking
+#   await acreate(**request)   async
+#
+# Providers are picked per persona through routes ("groq:<model>",
+# "fake:<model>"), tried in order by the Router below. LLM_PROVIDER
+# (groq by default, or fake) is the provider for bare model names.
+# Nothing touches the network or needs credentials until the first
+# real call.
+# ============================================================
+
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from types import SimpleNamespace
+
+from context import count_tokens
+
+
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "groq")
+
+
+# ============================================================
+# GROQ
+# ============================================================
+
+class GroqProvider:
+    """Groq clients built on first use, so importing needs no API key."""
+
+    name = "groq"
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key
+        self._client = None
+        self._async_client = None
+
+    def _key(self):
+        key = self.api_key or os.getenv("GROQ_API_KEY")
+        if not key:
+            raise RuntimeError("GROQ_API_KEY not set")
+        return key
+
+    @property
+    def client(self):
+        if self._client is None:
+            from groq import Groq
+            self._client = Groq(api_key=self._key())
+        return self._client
+
+    @property
+    def async_client(self):
+        # Shared async client: one connection pool for every socket/room awaiting a reply
+        if self._async_client is None:
+            from groq import AsyncGroq
+            self._async_client = AsyncGroq(api_key=self._key())
+        return self._async_client
+
+    def create(self, **request):
+        return self.client.chat.completions.create(**request)
+
+    async def acreate(self, **request):
+        return await self.async_client.chat.completions.create(**request)
+
+
+# ============================================================
+# FAKE
+# ============================================================
+
+def _completion(text, usage):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+        usage=usage,
+    )
+
+
+def _chunk(text, usage=None):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(delta=SimpleNamespace(content=text))] if text is not None else [],
+        usage=usage,
+    )
+
+
+class FakeProviderError(Exception):
+    status_code = 503
+
+
+class FakeProvider:
+    """
+    Local stand-in for tests, benchmarks and offline development.
+
+    Waits `ttft` seconds, then produces `reply_text(request)` one word at
+    a time, `token_latency` seconds apart (streamed or all at once), with
+    a `usage` estimate like a real provider reports. `ttft` may be a
+    callable returning a fresh delay per call (a latency distribution),
+    and `error_rate` of calls fail with a 503.
+    """
+
+    name = "fake"
+
+    def __init__(self, ttft=0.0, token_latency=0.0, reply=None, error_rate=0.0):
+        self.ttft = ttft
+        self.token_latency = token_latency
+        self.reply = reply
+        self.error_rate = error_rate
+        self.calls = 0
+
+    def _delay(self):
+        return self.ttft() if callable(self.ttft) else self.ttft
+
+    def reply_text(self, request) -> str:
+        if self.reply is not None:
+            return self.reply
+        return "Echo: " + request["messages"][-1]["content"][:200]
+
+    def _prepare(self, request):
+        self.calls += 1
+        words = self.reply_text(request).split(" ")
+        usage = SimpleNamespace(
+            prompt_tokens=sum(count_tokens(m["content"]) for m in request["messages"]),
+            completion_tokens=len(words),
+        )
+        return words, usage
+
+    def create(self, **request):
+        words, usage = self._prepare(request)
+        time.sleep(self._delay())
+        if random.random() < self.error_rate:
+            raise FakeProviderError("fake provider unavailable")
+        if request.get("stream"):
+            return self._stream(words, usage)
+        time.sleep(self.token_latency * len(words))
+        return _completion(" ".join(words), usage)
+
+    def _stream(self, words, usage):
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.token_latency)
+            yield _chunk(word if i == len(words) - 1 else word + " ")
+        yield _chunk(None, usage)
+
+    async def acreate(self, **request):
+        words, usage = self._prepare(request)
+        await asyncio.sleep(self._delay())
+        if random.random() < self.error_rate:
+            raise FakeProviderError("fake provider unavailable")
+        if request.get("stream"):
+            return self._astream(words, usage)
+        await asyncio.sleep(self.token_latency * len(words))
+        return _completion(" ".join(words), usage)
+
+    async def _astream(self, words, usage):
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(self.token_latency)
+            yield _chunk(word if i == len(words) - 1 else word + " ")
+        yield _chunk(None, usage)
+
+
+def _fake_from_env():
+    return FakeProvider(
+        ttft=float(os.getenv("FAKE_PROVIDER_TTFT", "0")),
+        token_latency=float(os.getenv("FAKE_PROVIDER_TOKEN_LATENCY", "0")),
+    )
+
+
+# ============================================================
+# ROUTING: per-persona models, fallback, hedging
+# ============================================================
+
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0") == "1"
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_MAX_RATIO = float(os.getenv("LLM_HEDGE_MAX_RATIO", "0.1"))  # hedges per request, at most
+
+_providers = {}
+_factories = {"groq": GroqProvider, "fake": _fake_from_env}
+
+
+def register_provider(name, provider):
+    """Make `provider` reachable from routes as "<name>:<model>"."""
+    _providers[name] = provider
+
+
+def get_provider(name):
+    provider = _providers.get(name)
+    if provider is None:
+        if name not in _factories:
+            raise ValueError(f"Unknown provider: {name}")
+        provider = _providers[name] = _factories[name]()
+    return provider
+
+
+def parse_route(spec, default_provider=LLM_PROVIDER):
+    """"groq:openai/gpt-oss-20b" -> ("groq", "openai/gpt-oss-20b"); a bare model uses the default provider."""
+    name, sep, model = spec.partition(":")
+    if sep and (name in _factories or name in _providers):
+        return name, model
+    return default_provider, spec
+
+
+def parse_routes(specs, default_provider=LLM_PROVIDER):
+    if isinstance(specs, str):
+        specs = [s for s in specs.split(",") if s.strip()]
+    return tuple(parse_route(s.strip(), default_provider) for s in specs)
+
+
+class LatencyTracker:
+    """Recent successful call latencies for one route."""
+
+    __slots__ = ("samples",)
+
+    def __init__(self, size=200):
+        self.samples = deque(maxlen=size)
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+
+    def quantile(self, q, min_samples):
+        if len(self.samples) < min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Router:
+    """
+    Sends a request along an ordered list of (provider, model) routes: if
+    a route fails, the next one is tried.
+
+    With hedging on (async calls only), a request that has not answered
+    within the route's recent p95 gets a second copy sent to the next
+    route (or the same one when it is the only route); whichever answers
+    first wins and the other is cancelled. Hedges are capped at
+    `max_hedge_ratio` of requests so a slow provider is not hit twice as
+    hard, and go through `admit(make_call, request)` when one is given,
+    so they count against the same rate limits as the request itself.
+    """
+
+    def __init__(
+        self,
+        hedge=LLM_HEDGE,
+        quantile=LLM_HEDGE_QUANTILE,
+        min_samples=LLM_HEDGE_MIN_SAMPLES,
+        max_hedge_ratio=LLM_HEDGE_MAX_RATIO,
+        admit=None,
+    ):
+        self.hedge = hedge
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.max_hedge_ratio = max_hedge_ratio
+        self.admit = admit
+        self._latency = {}  # (provider, model, stream) -> LatencyTracker
+
+        self.requests = 0
+        self.fallbacks = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    # ---------------- blocking ----------------
+    def create(self, routes, **request):
+        self.requests += 1
+        for i, (name, model) in enumerate(routes):
+            try:
+                return get_provider(name).create(**{**request, "model": model})
+            except Exception:
+                if i == len(routes) - 1:
+                    raise
+                self.fallbacks += 1
+
+    # ---------------- async ----------------
+    async def acreate(self, routes, **request):
+        self.requests += 1
+        for i in range(len(routes)):
+            try:
+                return await self._attempt(routes, i, request)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                if i == len(routes) - 1:
+                    raise
+                self.fallbacks += 1
+
+    def _tracker(self, route, request):
+        key = (*route, bool(request.get("stream")))
+        tracker = self._latency.get(key)
+        if tracker is None:
+            tracker = self._latency[key] = LatencyTracker()
+        return tracker
+
+    async def _call(self, route, request):
+        name, model = route
+        start = time.perf_counter()
+        result = await get_provider(name).acreate(**{**request, "model": model})
+        self._tracker(route, request).add(time.perf_counter() - start)
+        return result
+
+    async def _hedge_call(self, route, request):
+        if self.admit is None:
+            return await self._call(route, request)
+        return await self.admit(lambda: self._call(route, request), request)
+
+    def _hedge_after(self, route, request):
+        if not self.hedge or self.hedges >= self.max_hedge_ratio * self.requests:
+            return None
+        return self._tracker(route, request).quantile(self.quantile, self.min_samples)
+
+    async def _attempt(self, routes, i, request):
+        route = routes[i]
+        threshold = self._hedge_after(route, request)
+        if threshold is None:
+            return await self._call(route, request)
+
+        primary = asyncio.create_task(self._call(route, request))
+        backup = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=threshold)
+            if done:
+                return primary.result()
+
+            self.hedges += 1
+            backup_route = routes[i + 1] if i + 1 < len(routes) else route
+            backup = asyncio.create_task(self._hedge_call(backup_route, request))
+            pending = {primary, backup}
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self.hedge_wins += 1
+                        for other in (primary, backup):
+                            if other is not task:
+                                await _discard(other)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # Also reached when the caller is cancelled: stop whichever copies are still running
+            for task in (primary, backup):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "fallbacks": self.fallbacks,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
+
+
+async def _discard(task):
+    """Cancel a losing hedge, or close its stream if it finished too."""
+    if not task.done():
+        task.cancel()
+        return
+    if task.exception() is not None:
+        return
+    close = getattr(task.result(), "aclose", None) or getattr(task.result(), "close", None)
+    if close is not None:
+        result = close()
+        if asyncio.iscoroutine(result):
+            await result
@@ -0,0 +1,113 @@
+# ============================================================
+# registry.py — persona name / alias resolution
+# ============================================================
+
+
+def normalize(token: str) -> str:
+    return token.strip().casefold()
+
+
+def default_aliases(name: str) -> tuple[str, ...]:
+    """"CoderAI" -> ("coderai", "coder"); "base" -> ("base",)."""
+    full = normalize(name)
+    if full.endswith("ai") and len(full) > 2:
+        return full, full[:-2]
+    return (full,)
+
+
+class _Node:
+    __slots__ = ("children", "names")
+
+    def __init__(self):
+        self.children = {}
+        self.names = set()  # personas with an alias through this node
+
+
+class PersonaRegistry:
+    """
+    Resolves what users type to persona names, built once and updated on
+    register().
+
+    Exact aliases ("coder", "coderai", any extra ones) are a dict lookup.
+    Anything else is treated as a prefix and resolved through a trie, but
+    only when it is unambiguous: "sci" finds ScientistAI, "p" (PoetAI or
+    PhilosopherAI) finds nothing.
+
+    Registering a name again replaces its aliases.
+    """
+
+    def __init__(self, names=()):
+        self._aliases: dict[str, str] = {}
+        self._root = _Node()
+        self._registered: dict[str, tuple[str, ...]] = {}  # name -> its current aliases
+        self.names: list[str] = []
+        for name in names:
+            self.register(name)
+
+    def register(self, name: str, aliases=()):
+        if name not in self.names:
+            self.names.append(name)
+        for alias in self._registered.get(name, ()):
+            self._unlink(name, alias)
+
+        aliases = tuple(dict.fromkeys(default_aliases(name) + tuple(normalize(a) for a in aliases)))
+        self._registered[name] = aliases
+        for alias in aliases:
+            self._aliases[alias] = name
+            node = self._root
+            for char in alias:
+                node = node.children.setdefault(char, _Node())
+                node.names.add(name)
+
+    def _unlink(self, name: str, alias: str):
+        if self._aliases.get(alias) == name:
+            del self._aliases[alias]
+        node = self._root
+        for char in alias:
+            child = node.children.get(char)
+            if child is None:
+                return
+            child.names.discard(name)
+            if not child.names:
+                del node.children[char]  # nothing below it leads to a persona either
+                return
+            node = child
+
+    def get(self, token: str) -> str | None:
+        """Exact alias match only."""
+        return self._aliases.get(normalize(token))
+
+    def resolve(self, token: str) -> str | None:
+        """Exact alias, else the single persona `token` is a prefix of."""
+        key = normalize(token)
+        name = self._aliases.get(key)
+        if name is not None or not key:
+            return name
+
+        node = self._root
+        for char in key:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return next(iter(node.names)) if len(node.names) == 1 else None
+
+    def resolve_many(self, tokens) -> list[str]:
+        """Resolve each token; unknown ones are skipped, repeats kept once, in order."""
+        found = []
+        for token in tokens:
+            name = self.resolve(token)
+            if name is not None and name not in found:
+                found.append(name)
+        return found
+
+    def match_command(self, message: str):
+        """
+        Split "<persona> <text>" into (persona, text) when the first word is
+        an exact alias; None otherwise so ordinary chat never gets captured
+        by a prefix.
+        """
+        parts = message.split(maxsplit=1)
+        if len(parts) < 2:
+            return None
+        name = self.get(parts[0])
+        return (name, parts[1].strip()) if name is not None else None
@@ -0,0 +1,211 @@
+# ============================================================
+# response_cache.py — optional cache for persona replies
+# ============================================================
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def cache_key(system_prompt, user_msg, temperature, model):
+    """Stable key for one (system prompt, user message, temperature, model) request."""
+    prompt_hash = hashlib.sha256(system_prompt.encode()).hexdigest()
+    raw = "\x1f".join((prompt_hash, user_msg, repr(float(temperature)), model))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+# ============================================================
+# BACKENDS
+# ============================================================
+
+class MemoryBackend:
+    """In-process LRU bounded by total bytes, with per-entry expiry."""
+
+    blocking = False
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()  # key -> (value, expires_at, size)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at, size = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                self.size -= size
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        size = len(key) + len(value.encode())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[2]
+            self._entries[key] = (value, time.time() + ttl, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+
+
+class SqliteBackend:
+    """
+    Cache shared between processes through one sqlite file, e.g. several
+    uvicorn workers. Least recently used rows are evicted past `max_bytes`.
+
+    The total size is kept in a one-row table by triggers, so checking the
+    budget after a write is a single-row read, not a scan, and stays exact
+    across processes.
+    """
+
+    blocking = True  # file I/O: call from a worker thread on the event loop
+
+    def __init__(self, path, max_bytes):
+        self.max_bytes = max_bytes
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL, used_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_response_cache_used ON response_cache (used_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_response_cache_expires ON response_cache (expires_at)")
+        with self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS response_cache_size (total INTEGER NOT NULL)")
+            # Files written before the size table existed start from their current total
+            self._conn.execute(
+                "INSERT INTO response_cache_size SELECT COALESCE(SUM(size), 0) FROM response_cache"
+                " WHERE NOT EXISTS (SELECT 1 FROM response_cache_size)"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS response_cache_added AFTER INSERT ON response_cache"
+                " BEGIN UPDATE response_cache_size SET total = total + NEW.size; END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS response_cache_replaced AFTER UPDATE OF size ON response_cache"
+                " BEGIN UPDATE response_cache_size SET total = total + NEW.size - OLD.size; END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS response_cache_removed AFTER DELETE ON response_cache"
+                " BEGIN UPDATE response_cache_size SET total = total - OLD.size; END"
+            )
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE response_cache SET used_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key, value, ttl):
+        size = len(key) + len(value.encode())
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            # An upsert rather than INSERT OR REPLACE: REPLACE's implicit delete skips the triggers
+            self._conn.execute(
+                "INSERT INTO response_cache VALUES (?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET"
+                " value = excluded.value, size = excluded.size,"
+                " expires_at = excluded.expires_at, used_at = excluded.used_at",
+                (key, value, size, now + ttl, now),
+            )
+            if self._total() > self.max_bytes:
+                self._evict()
+
+    def _total(self) -> int:
+        return self._conn.execute("SELECT total FROM response_cache_size").fetchone()[0]
+
+    def _evict(self):
+        # Expired rows go first; only then is the LRU order walked
+        self._conn.execute("DELETE FROM response_cache WHERE expires_at < ?", (time.time(),))
+        total = self._total()
+        if total <= self.max_bytes:
+            return
+        # Walk from least recently used until enough bytes are freed
+        excess = total - self.max_bytes
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM response_cache ORDER BY used_at"):
+            doomed.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._conn.executemany("DELETE FROM response_cache WHERE key = ?", doomed)
+
+
+# ============================================================
+# CACHE
+# ============================================================
+
+class ResponseCache:
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, system_prompt, user_msg, temperature, model):
+        value = self.backend.get(cache_key(system_prompt, user_msg, temperature, model))
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, system_prompt, user_msg, temperature, model, reply):
+        if reply:
+            self.backend.set(cache_key(system_prompt, user_msg, temperature, model), reply, self.ttl)
+
+    async def aget(self, system_prompt, user_msg, temperature, model):
+        """get() for the event loop; a blocking backend is read from a worker thread."""
+        if not self.backend.blocking:
+            return self.get(system_prompt, user_msg, temperature, model)
+        return await asyncio.to_thread(self.get, system_prompt, user_msg, temperature, model)
+
+    async def aset(self, system_prompt, user_msg, temperature, model, reply):
+        if not self.backend.blocking:
+            return self.set(system_prompt, user_msg, temperature, model, reply)
+        await asyncio.to_thread(self.set, system_prompt, user_msg, temperature, model, reply)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def cache_from_env():
+    """
+    Build the cache from RESPONSE_CACHE_BACKEND ("off", "memory" or "sqlite").
+    Returns None when caching is off, which is the default.
+    """
+    backend = os.getenv("RESPONSE_CACHE_BACKEND", "off").lower()
+    max_bytes = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    ttl = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+
+    if backend == "memory":
+        return ResponseCache(MemoryBackend(max_bytes), ttl)
+    if backend == "sqlite":
+        path = os.getenv("RESPONSE_CACHE_PATH", "response_cache.sqlite3")
+        return ResponseCache(SqliteBackend(path, max_bytes), ttl)
+    return None
@@ -0,0 +1,104 @@
+# ============================================================
+# rooms.py — chatroom registry
+# ============================================================
+
+import asyncio
+import uuid
+from dataclasses import dataclass, field
+
+from fastapi import WebSocket
+
+from context import RoomContext
+
+
+LOBBY_ID = "lobby"
+
+
+@dataclass(slots=True, eq=False)
+class Room:
+    """
+    One chatroom as seen by this worker: its local member sockets, agents
+    and context. The turn counter lives on the bus so that every worker
+    hosting the room agrees on whose turn it is.
+
+    Chatroom messages wait in `inbox` (bounded) for the room's `worker`
+    task, which runs one reply at a time as `current`.
+    """
+    id: str
+    agents: tuple[str, ...] = ()
+    members: set[WebSocket] = field(default_factory=set)
+    context: RoomContext = field(default_factory=RoomContext)
+    inbox: asyncio.Queue | None = None
+    worker: asyncio.Task | None = None
+    current: asyncio.Task | None = None
+
+    @property
+    def is_chatroom(self) -> bool:
+        return bool(self.agents)
+
+    def close(self):
+        """Cancel queued and in-flight replies; nobody is left to read them."""
+        for task in (self.current, self.worker):
+            if task is not None:
+                task.cancel()
+
+    def agent_for_turn(self, turn: int) -> str:
+        return self.agents[turn % len(self.agents)]
+
+
+class RoomRegistry:
+    """
+    Maps room ids to rooms and each socket to the one room it is in.
+
+    Sockets that are not in a chatroom sit in the lobby, which keeps the
+    old behavior of direct/base chat being visible to every lobby member.
+    Empty chatrooms are dropped, and `on_close(room)` is called for each.
+    """
+
+    def __init__(self, on_close=None):
+        self.on_close = on_close
+        self.lobby = Room(LOBBY_ID)
+        self.rooms: dict[str, Room] = {LOBBY_ID: self.lobby}
+        self._room_of: dict[WebSocket, Room] = {}
+
+    def __len__(self):
+        return len(self.rooms)
+
+    def __contains__(self, websocket: WebSocket) -> bool:
+        return websocket in self._room_of
+
+    @property
+    def connections(self) -> int:
+        return len(self._room_of)
+
+    def get(self, room_id: str) -> Room | None:
+        return self.rooms.get(room_id)
+
+    def room_of(self, websocket: WebSocket) -> Room:
+        return self._room_of.get(websocket, self.lobby)
+
+    def create(self, agents) -> Room:
+        return self.adopt(str(uuid.uuid4()), agents)
+
+    def adopt(self, room_id: str, agents) -> Room:
+        """Local copy of a room that may have been created on another worker."""
+        room = self.rooms.get(room_id)
+        if room is None:
+            room = self.rooms[room_id] = Room(room_id, tuple(agents))
+        return room
+
+    def join(self, websocket: WebSocket, room: Room):
+        self.leave(websocket)
+        room.members.add(websocket)
+        self._room_of[websocket] = room
+
+    def leave(self, websocket: WebSocket):
+        room = self._room_of.pop(websocket, None)
+        if room is None:
+            return
+        room.members.discard(websocket)
+        if not room.members and room is not self.lobby:
+            del self.rooms[room.id]
+            room.close()
+            if self.on_close is not None:
+                self.on_close(room)
@@ -0,0 +1,335 @@
+# ============================================================
+# scheduler.py — rate-limit aware provider request scheduler
+# ============================================================
+
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+
+PROVIDER_RPM = float(os.getenv("PROVIDER_RPM", "0"))    # requests/minute, 0 = unlimited
+PROVIDER_TPM = float(os.getenv("PROVIDER_TPM", "0"))    # tokens/minute, 0 = unlimited
+PROVIDER_BURST_SECONDS = float(os.getenv("PROVIDER_BURST_SECONDS", "15"))  # bucket size, in seconds of quota
+PROVIDER_MAX_IN_FLIGHT = int(os.getenv("PROVIDER_MAX_IN_FLIGHT", "64"))
+PROVIDER_MAX_RETRIES = int(os.getenv("PROVIDER_MAX_RETRIES", "3"))
+PROVIDER_RETRY_BASE = float(os.getenv("PROVIDER_RETRY_BASE", "0.5"))
+PROVIDER_RETRY_MAX = float(os.getenv("PROVIDER_RETRY_MAX", "20"))
+
+# Lower value = served first
+DIRECT = 0        # a user waiting on a direct/chatroom reply
+BACKGROUND = 1    # debate turns and other bulk work
+
+_priority = contextvars.ContextVar("provider_priority", default=DIRECT)
+_room = contextvars.ContextVar("provider_room", default=None)
+
+RETRYABLE_ERRORS = ("APIConnectionError", "APITimeoutError")
+
+
+@contextmanager
+def request_context(priority=DIRECT, room=None):
+    """
+    Tag provider calls made inside this block (including tasks created in
+    it) with a priority and the room they are for.
+    """
+    priority_token = _priority.set(priority)
+    room_token = _room.set(room)
+    try:
+        yield
+    finally:
+        _priority.reset(priority_token)
+        _room.reset(room_token)
+
+
+# ============================================================
+# TOKEN BUCKET
+# ============================================================
+
+class TokenBucket:
+    """
+    `per_minute` units refilled continuously, holding at most
+    `burst_seconds` worth of them; a rate of 0 never limits.
+    """
+
+    def __init__(self, per_minute, burst_seconds=PROVIDER_BURST_SECONDS):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, amount) -> float:
+        """Seconds until `amount` units are available."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.tokens) / self.rate)
+
+    def consume(self, amount):
+        if self.rate > 0:
+            self._refill()
+            self.tokens -= min(amount, self.capacity)
+
+
+# ============================================================
+# SCHEDULER
+# ============================================================
+
+class _Waiter:
+    __slots__ = ("future", "tokens")
+
+    def __init__(self, future, tokens):
+        self.future = future
+        self.tokens = tokens
+
+
+def is_retryable(exc) -> bool:
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return type(exc).__name__ in RETRYABLE_ERRORS
+
+
+class _HeldStream:
+    """A streamed completion that keeps its in-flight slot until it is exhausted, fails or is closed."""
+
+    __slots__ = ("_stream", "_iter", "_release")
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._iter = None
+        self._release = release
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._iter is None:
+            self._iter = self._stream.__aiter__()
+        try:
+            return await self._iter.__anext__()
+        except BaseException:  # end of stream, provider error or cancellation
+            self._done()
+            raise
+
+    def _done(self):
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+
+    async def aclose(self):
+        self._done()
+        close = getattr(self._stream, "aclose", None) or getattr(self._stream, "close", None)
+        if close is not None:
+            result = close()
+            if asyncio.iscoroutine(result):
+                await result
+
+    def __del__(self):
+        self._done()  # dropped without being closed
+
+
+class Scheduler:
+    """
+    Admits provider calls under request/token-per-minute buckets and an
+    in-flight cap. A streamed reply holds its in-flight slot until the
+    stream is exhausted or closed, not just until it starts.
+
+    Waiting calls are queued by priority and, within a priority, by room;
+    rooms take turns so one busy room cannot starve the others. Calls that
+    fail with 429/5xx are retried with full-jitter exponential backoff
+    (or the provider's Retry-After when it sends one).
+
+    The scheduler lives on one event loop. Blocking code in other threads
+    goes through `submit`, so it shares the same limits.
+    """
+
+    def __init__(
+        self,
+        rpm=PROVIDER_RPM,
+        tpm=PROVIDER_TPM,
+        burst_seconds=PROVIDER_BURST_SECONDS,
+        max_in_flight=PROVIDER_MAX_IN_FLIGHT,
+        max_retries=PROVIDER_MAX_RETRIES,
+        retry_base=PROVIDER_RETRY_BASE,
+        retry_max=PROVIDER_RETRY_MAX,
+    ):
+        self.requests = TokenBucket(rpm, burst_seconds)
+        self.tokens = TokenBucket(tpm, burst_seconds)
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+
+        self._queues = {DIRECT: OrderedDict(), BACKGROUND: OrderedDict()}  # room -> deque[_Waiter]
+        self._in_flight = 0
+        self._changed = None
+        self._dispatcher = None
+        self._own_loop = None  # for blocking callers when no app loop is running
+        self._own_loop_lock = threading.Lock()
+
+        self.admitted = 0
+        self.retries = 0
+        self.failures = 0
+
+    # ---------------- public ----------------
+    async def run(self, make_call, tokens=0, max_retries=None):
+        """Await `make_call()` once admitted, retrying retryable provider errors."""
+        priority, room = _priority.get(), _room.get()
+        max_retries = self.max_retries if max_retries is None else max_retries
+        attempt = 0
+        while True:
+            await self._admit(priority, room, tokens)
+            try:
+                result = await make_call()
+            except Exception as exc:
+                self._release()
+                if not is_retryable(exc) or attempt >= max_retries:
+                    self.failures += 1
+                    raise
+                self.retries += 1
+                delay = self._backoff(attempt, exc)
+            except BaseException:
+                self._release()
+                raise
+            else:
+                if hasattr(result, "__aiter__"):
+                    return _HeldStream(result, self._release)
+                self._release()
+                return result
+
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def submit(self, coro):
+        """
+        Run `coro` (which makes its provider calls through run()) on the
+        scheduler's loop and block this thread until it returns. Outside
+        the app, a private loop on a daemon thread takes that role.
+        """
+        loop = self._home_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            coro.close()
+            raise RuntimeError("blocking provider call on the event loop; await the async variant instead")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    def _home_loop(self):
+        dispatcher = self._dispatcher
+        if dispatcher is not None and not dispatcher.done() and dispatcher.get_loop().is_running():
+            return dispatcher.get_loop()
+        with self._own_loop_lock:
+            if self._own_loop is None:
+                self._own_loop = asyncio.new_event_loop()
+                threading.Thread(target=self._own_loop.run_forever, name="scheduler", daemon=True).start()
+            return self._own_loop
+
+    def close(self):
+        """Stop the private loop started by `submit`, if any."""
+        loop, self._own_loop = self._own_loop, None
+        if loop is not None:
+            asyncio.run_coroutine_threadsafe(self._stop_dispatcher(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+
+    async def _stop_dispatcher(self):
+        dispatcher = self._dispatcher
+        if dispatcher is not None and dispatcher.get_loop() is asyncio.get_running_loop():
+            dispatcher.cancel()
+            await asyncio.wait({dispatcher})
+
+    def stats(self) -> dict:
+        return {
+            "queued": sum(len(q) for queues in self._queues.values() for q in queues.values()),
+            "in_flight": self._in_flight,
+            "admitted": self.admitted,
+            "retries": self.retries,
+            "failures": self.failures,
+        }
+
+    # ---------------- admission ----------------
+    def _ensure_dispatcher(self):
+        loop = asyncio.get_running_loop()
+        if self._dispatcher is None or self._dispatcher.done() or self._dispatcher.get_loop() is not loop:
+            self._changed = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def _admit(self, priority, room, tokens):
+        self._ensure_dispatcher()
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), tokens)
+        self._queues[priority].setdefault(room, deque()).append(waiter)
+        self._changed.set()
+        try:
+            await waiter.future  # cancelled callers leave a done future the dispatcher skips
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self._release()  # admitted just before the cancel landed
+            raise
+
+    def _release(self):
+        self._in_flight -= 1
+        self._changed.set()
+
+    def _peek(self):
+        """Next live waiter: highest priority first, rooms in round-robin order."""
+        for queues in self._queues.values():
+            while queues:
+                room, waiters = next(iter(queues.items()))
+                while waiters and waiters[0].future.done():
+                    waiters.popleft()
+                if waiters:
+                    return queues, room, waiters
+                del queues[room]
+        return None
+
+    async def _dispatch(self):
+        while True:
+            head = self._peek()
+            if head is None or self._in_flight >= self.max_in_flight:
+                self._changed.clear()
+                await self._changed.wait()
+                continue
+
+            queues, room, waiters = head
+            tokens = waiters[0].tokens
+            delay = max(self.requests.delay(1), self.tokens.delay(tokens))
+            if delay > 0:
+                # Re-check afterwards: a higher-priority call may have arrived
+                self._changed.clear()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            waiter = waiters.popleft()
+            queues.move_to_end(room)  # this room goes to the back of the line
+            self.requests.consume(1)
+            self.tokens.consume(tokens)
+            self._in_flight += 1
+            self.admitted += 1
+            waiter.future.set_result(None)
+
+    def _backoff(self, attempt, exc) -> float:
+        response = getattr(exc, "response", None)
+        retry_after = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(self.retry_max, float(retry_after))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.retry_max, self.retry_base * 2 ** attempt))
+
+
+scheduler = Scheduler()
@@ -0,0 +1,128 @@
+# ============================================================
+# singleflight.py — coalesce identical in-flight async calls
+# ============================================================
+
+import asyncio
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class _SharedStream:
+    """Chunks of one source stream, buffered so late subscribers replay from the start."""
+
+    __slots__ = ("parts", "done", "error", "changed", "task", "waiters")
+
+    def __init__(self):
+        self.parts = []
+        self.done = False
+        self.error = None
+        self.changed = asyncio.get_running_loop().create_future()
+        self.task = None
+        self.waiters = 0
+
+    def _notify(self):
+        changed, self.changed = self.changed, asyncio.get_running_loop().create_future()
+        changed.set_result(None)
+
+    async def pump(self, source):
+        try:
+            async for part in source:
+                self.parts.append(part)
+                self._notify()
+        except asyncio.CancelledError:
+            self.error = asyncio.CancelledError()
+            raise
+        except Exception as exc:
+            self.error = exc
+        finally:
+            self.done = True
+            self._notify()
+
+    async def subscribe(self):
+        i = 0
+        while True:
+            while i < len(self.parts):
+                yield self.parts[i]
+                i += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            # asyncio.wait: a cancelled subscriber must not cancel the shared future
+            await asyncio.wait({self.changed})
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time; callers arriving while it is
+    in flight share its result (or error) instead of starting their own.
+
+    The shared call only gets cancelled once every caller waiting on it
+    has gone away, so one client disconnecting does not cut off the rest.
+    """
+
+    def __init__(self):
+        self._calls: dict[object, _Flight] = {}
+        self._streams: dict[object, _SharedStream] = {}
+        self.calls = 0     # calls actually started
+        self.shared = 0    # callers served by someone else's call (calls saved)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "shared": self.shared,
+            "in_flight": len(self._calls) + len(self._streams),
+        }
+
+    async def do(self, key, make_call):
+        """Await `make_call()`, or the identical call already running under `key`."""
+        flight = self._calls.get(key)
+        if flight is None:
+            self.calls += 1
+            flight = self._calls[key] = _Flight(asyncio.ensure_future(make_call()))
+            flight.task.add_done_callback(lambda _: self._forget(self._calls, key, flight))
+        else:
+            self.shared += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Forgotten now, not when the cancel lands: a caller arriving
+                # in between (a retry after a disconnect) starts a fresh call
+                self._forget(self._calls, key, flight)
+                flight.task.cancel()
+
+    async def stream(self, key, make_stream):
+        """Iterate `make_stream()`, or replay-and-follow the identical stream already running under `key`."""
+        shared = self._streams.get(key)
+        if shared is None:
+            self.calls += 1
+            shared = self._streams[key] = _SharedStream()
+            shared.task = asyncio.ensure_future(shared.pump(make_stream()))
+            shared.task.add_done_callback(lambda _: self._forget(self._streams, key, shared))
+        else:
+            self.shared += 1
+
+        shared.waiters += 1
+        try:
+            async for part in shared.subscribe():
+                yield part
+        finally:
+            shared.waiters -= 1
+            if shared.waiters == 0 and not shared.task.done():
+                self._forget(self._streams, key, shared)
+                shared.task.cancel()
+
+    @staticmethod
+    def _forget(table, key, entry):
+        if table.get(key) is entry:
+            del table[key]
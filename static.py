@@ -0,0 +1,165 @@
+# ============================================================
+# static.py — frontend files held in memory, precompressed
+#
+# Every file is read once at startup and kept with gzip (and brotli,
+# if the brotli package is installed) variants and a content-hash
+# ETag. front.html is rewritten to point at fingerprinted names
+# (/static/script.<hash>.js), which are cached for a year; the page
+# itself and plain names revalidate and get 304 when unchanged.
+#
+# STATIC_RELOAD=1 (set by `python main.py --reload`) re-reads the
+# files whenever one of them changes on disk.
+# ============================================================
+
+import gzip
+import hashlib
+import mimetypes
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+STATIC_DIR = Path(os.getenv("STATIC_DIR", Path(__file__).parent / "app"))
+STATIC_FILES = ("front.html", "style.css", "script.js")
+STATIC_RELOAD = os.getenv("STATIC_RELOAD", "0") == "1"
+STATIC_PREFIX = "/static/"
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+
+@dataclass(slots=True)
+class Asset:
+    name: str
+    media_type: str
+    etag: str                     # hash of the identity body, without quotes
+    fingerprinted: str            # e.g. script.3f2a9c1b.js
+    variants: dict                # content-coding ("identity", "gzip", "br") -> bytes
+
+
+def _fingerprint(name: str, digest: str) -> str:
+    stem, dot, suffix = name.rpartition(".")
+    return f"{stem}.{digest[:8]}.{suffix}" if dot else f"{name}.{digest[:8]}"
+
+
+def _compress(body: bytes) -> dict:
+    variants = {"identity": body}
+    packed = gzip.compress(body, compresslevel=9, mtime=0)
+    if len(packed) < len(body):
+        variants["gzip"] = packed
+    if brotli is not None:
+        packed = brotli.compress(body, quality=11)
+        if len(packed) < len(body):
+            variants["br"] = packed
+    return variants
+
+
+def _asset(name: str, body: bytes) -> Asset:
+    digest = hashlib.sha256(body).hexdigest()
+    media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if media_type.startswith("text/") or media_type == "application/javascript":
+        media_type += "; charset=utf-8"
+    return Asset(name, media_type, digest[:16], _fingerprint(name, digest), _compress(body))
+
+
+def _accepted(accept_encoding: str) -> set:
+    """Content-codings the client accepts (those not given q=0)."""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        q = params.strip().removeprefix("q=")
+        try:
+            if params and float(q) == 0:
+                continue
+        except ValueError:
+            pass
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+class StaticAssets:
+    """In-memory frontend files; `response()` does encoding negotiation and conditional GETs."""
+
+    def __init__(self, directory=STATIC_DIR, files=STATIC_FILES, reload=STATIC_RELOAD):
+        self.directory = Path(directory)
+        self.files = tuple(files)
+        self.reload = reload
+        self._assets = {}    # plain and fingerprinted name -> Asset
+        self._mtimes = None
+
+        self.responses = 0
+        self.not_modified = 0
+        self.reloads = 0
+        self.load()
+
+    def _stat(self):
+        return tuple(os.stat(self.directory / name).st_mtime_ns for name in self.files)
+
+    def load(self):
+        """(Re-)read every file; HTML pages are rewritten to reference the fingerprinted assets."""
+        mtimes = self._stat()
+        raw = {name: (self.directory / name).read_bytes() for name in self.files}
+
+        assets = {name: _asset(name, body) for name, body in raw.items() if not name.endswith(".html")}
+        for name, body in raw.items():
+            if name.endswith(".html"):
+                text = body.decode("utf-8")
+                for asset in assets.values():
+                    for quote in ('"', "'"):
+                        text = text.replace(
+                            f"{quote}{asset.name}{quote}", f"{quote}{STATIC_PREFIX}{asset.fingerprinted}{quote}"
+                        )
+                assets[name] = _asset(name, text.encode("utf-8"))
+
+        self._assets = {**assets, **{a.fingerprinted: a for a in assets.values()}}
+        self._mtimes = mtimes
+        self.reloads += 1
+
+    def get(self, name: str) -> Asset | None:
+        if self.reload and self._stat() != self._mtimes:
+            self.load()
+        return self._assets.get(name)
+
+    def response(self, request: Request, name: str) -> Response | None:
+        """The asset's response for this request (200 or 304), or None if there is no such file."""
+        asset = self.get(name)
+        if asset is None:
+            return None
+        self.responses += 1
+
+        accepted = _accepted(request.headers.get("accept-encoding", ""))
+        coding = next((c for c in ("br", "gzip") if c in asset.variants and c in accepted), "identity")
+        etag = f'"{asset.etag}"' if coding == "identity" else f'"{asset.etag}-{coding}"'
+
+        headers = {
+            "ETag": etag,
+            "Cache-Control": IMMUTABLE if name == asset.fingerprinted else REVALIDATE,
+            "Vary": "Accept-Encoding",
+        }
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = {t.strip().removeprefix("W/").strip('"') for t in if_none_match.split(",")}
+            # Any encoding of the same content counts as a match
+            if "*" in tags or asset.etag in {t.split("-")[0] for t in tags}:
+                self.not_modified += 1
+                return Response(status_code=304, headers=headers)
+
+        if coding != "identity":
+            headers["Content-Encoding"] = coding
+        return Response(asset.variants[coding], media_type=asset.media_type, headers=headers)
+
+    def stats(self) -> dict:
+        return {
+            "files": len(self.files),
+            "bytes": sum(len(self._assets[name].variants["identity"]) for name in self.files),
+            "responses": self.responses,
+            "not_modified": self.not_modified,
+            "reloads": self.reloads,
+        }
@@ -0,0 +1,5 @@
+import os
+
+# Everything imports offline: the fake provider and a throwaway sqlite database
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
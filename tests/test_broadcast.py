@@ -0,0 +1,86 @@
+import asyncio
+
+from broadcast import Broadcaster, unpack
+
+
+class StuckSocket:
+    """Accepts nothing until `release` is set."""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.received = []
+        self.closed = None
+
+    async def send_text(self, data):
+        await self.release.wait()
+        self.received.append(data)
+
+    async def send_bytes(self, data):
+        await self.send_text(unpack(data))
+
+    async def close(self, code=1000, reason=""):
+        self.closed = code
+
+
+def stream(broadcaster, socket, deltas):
+    broadcaster.send(socket, {"author": "System", "content": "thinking"})
+    broadcaster.send(socket, {"type": "start", "id": "r", "author": "CoderAI"})
+    for i in range(deltas):
+        broadcaster.send(socket, {"type": "delta", "id": "r", "content": f"{i} "})
+    broadcaster.send(socket, {"type": "end", "id": "r", "author": "CoderAI", "content": "full reply"})
+
+
+def test_drop_policy_only_drops_deltas():
+    async def main():
+        broadcaster = Broadcaster(queue_size=4, policy="drop")
+        socket = StuckSocket()
+        broadcaster.register(socket, binary=True)
+        stream(broadcaster, socket, deltas=20)
+        socket.release.set()
+        await asyncio.sleep(0.01)
+        return socket, broadcaster.stats()
+
+    socket, stats = asyncio.run(main())
+    assert socket.received[:2] == [
+        '{"author":"System","content":"thinking"}',
+        '{"type":"start","id":"r","author":"CoderAI"}',
+    ]
+    assert socket.received[-1] == '{"type":"end","id":"r","author":"CoderAI","content":"full reply"}'
+    deltas = [frame for frame in socket.received if '"type":"delta"' in frame]
+    assert len(socket.received) == 3 + len(deltas)
+    assert stats["frames_dropped"] == 20 - len(deltas) > 0
+    assert socket.closed is None
+
+
+def test_socket_full_of_control_frames_is_closed_not_silently_truncated():
+    async def main():
+        closed = []
+        broadcaster = Broadcaster(queue_size=2, policy="drop", on_close=closed.append)
+        socket = StuckSocket()
+        broadcaster.register(socket)
+        for i in range(3):
+            broadcaster.send(socket, {"author": "System", "content": f"notice {i}"})
+        await asyncio.sleep(0.01)
+        return closed == [socket], socket.closed, broadcaster.stats()
+
+    was_reported, code, stats = asyncio.run(main())
+    assert was_reported and code == 1008
+    assert stats["slow_disconnects"] == 1 and stats["frames_dropped"] == 0
+
+
+def test_send_wait_waits_for_room_instead_of_dropping():
+    async def main():
+        broadcaster = Broadcaster(queue_size=2)
+        socket = StuckSocket()
+        broadcaster.register(socket)
+        sender = asyncio.ensure_future(asyncio.gather(
+            *(broadcaster.send_wait(socket, {"type": "delta", "content": str(i)}) for i in range(6))
+        ))
+        await asyncio.sleep(0.01)
+        assert not sender.done()
+        socket.release.set()
+        await sender
+        await asyncio.sleep(0.01)
+        return len(socket.received), broadcaster.stats()["frames_dropped"]
+
+    assert asyncio.run(main()) == (6, 0)
@@ -0,0 +1,53 @@
+import asyncio
+import json
+
+from bus import Broker, LocalBus, SocketBus
+
+
+def test_local_bus_state():
+    async def main():
+        bus = LocalBus()
+        await bus.set("room:1", {"agents": ["CoderAI"]})
+        assert await bus.incr("turn:1") == 0
+        assert await bus.incr("turn:1", 5) == 1
+        await bus.delete("room:1", "turn:1", "missing")
+        return await bus.get("room:1"), await bus.get("turn:1")
+
+    assert asyncio.run(main()) == (None, None)
+
+
+def test_broker_drops_a_subscriber_that_stops_reading(tmp_path):
+    path = tmp_path / "bus.sock"
+
+    async def main():
+        broker = Broker(max_buffer=64 * 1024)
+        server = await asyncio.start_unix_server(broker.handle, path=str(path))
+
+        # A stuck worker: subscribes, then never reads
+        _, stuck = await asyncio.open_unix_connection(str(path))
+        stuck.write(json.dumps({"op": "sub"}).encode() + b"\n")
+        await stuck.drain()
+
+        received = []
+        worker = SocketBus(f"unix://{path}")
+        worker.on_message = lambda room, message, remote: received.append(message)
+        await worker.start()
+        await worker.get("warm-up")  # both subscriptions are in
+
+        big = "x" * 16 * 1024
+        for _ in range(500):
+            await asyncio.wait_for(worker.publish("room", big), 1.0)
+        await worker.set("done", True)
+        await asyncio.sleep(0.05)
+
+        try:
+            return broker.dropped, len(broker.subscribers), len(received)
+        finally:
+            stuck.close()
+            await worker.stop()
+            server.close()
+
+    dropped, subscribers, received = asyncio.run(main())
+    assert dropped == 1
+    assert subscribers == 1
+    assert received == 500
@@ -0,0 +1,55 @@
+import asyncio
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import agents2
+import models  # noqa: F401  (registers the tables on Base)
+from database import Base
+from memory_store import InMemoryStore, SqlMemoryStore
+
+
+def sql_store(**kwargs):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    return SqlMemoryStore(sessionmaker(bind=engine), **kwargs)
+
+
+def test_sql_store_cache_is_bounded_and_skips_empty_scopes():
+    store = sql_store(cache_size=3)
+    for i in range(5000):
+        assert store.facts("CoderAI", f"session-{i}") == []
+    assert len(store._cache) == 0
+
+    for i in range(5):
+        store.remember("CoderAI", f"room-{i}", f"fact {i}")
+        assert store.facts("CoderAI", f"room-{i}") == [f"fact {i}"]
+    assert list(store._cache) == [("CoderAI", "room-2"), ("CoderAI", "room-3"), ("CoderAI", "room-4")]
+
+    store.drop_cached("room-3")
+    assert ("CoderAI", "room-3") not in store._cache
+
+
+def test_suffix_cache_is_bounded_and_dropped_with_its_scope(monkeypatch):
+    monkeypatch.setattr(agents2, "memory_store", InMemoryStore())
+    monkeypatch.setattr(agents2, "_MEMORY_SUFFIX", type(agents2._MEMORY_SUFFIX)())
+    monkeypatch.setattr(agents2, "MEMORY_CACHE_SIZE", 4)
+
+    async def main():
+        for i in range(5000):
+            await agents2.build_system_prompt_async("CoderAI", f"session-{i}", query="hello")
+        assert len(agents2._MEMORY_SUFFIX) == 0
+
+        for i in range(6):
+            agents2.remember("CoderAI", f"fact {i}", scope=f"room-{i}")
+            prompt = await agents2.build_system_prompt_async("CoderAI", f"room-{i}", query="hello")
+            assert f"- fact {i}" in prompt
+        assert len(agents2._MEMORY_SUFFIX) == 4
+
+        agents2.forget_scope("room-5")
+        assert ("CoderAI", "room-5") not in agents2._MEMORY_SUFFIX
+        # Stored facts outlive the cache entry
+        assert "- fact 5" in agents2.build_system_prompt("CoderAI", "room-5")
+
+    asyncio.run(main())
@@ -0,0 +1,21 @@
+import agents2
+from providers import FakeProvider
+from scheduler import Scheduler
+
+HELPERS = ("base", "coder", "philosopher", "joker", "scientist", "lawyer", "teacher",
+           "poet", "villain", "historian", "doctor", "comedian", "anime")
+
+
+def test_every_persona_has_a_helper_and_every_helper_a_persona(monkeypatch):
+    scheduler = Scheduler()
+    monkeypatch.setattr(agents2, "scheduler", scheduler)
+    provider = FakeProvider(reply="hello")
+    agents2.use_provider(provider)
+    monkeypatch.setattr(agents2, "_PERSONA_ROUTES", {})
+
+    assert {name.removesuffix("AI").lower() for name in agents2.PERSONAS} == set(HELPERS)
+    try:
+        assert [getattr(agents2, helper)("hi") for helper in HELPERS] == ["hello"] * len(HELPERS)
+    finally:
+        scheduler.close()
+    assert provider.calls == len(HELPERS)
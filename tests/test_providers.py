@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+import agents2
+from providers import FakeProvider, FakeProviderError, Router, register_provider
+from scheduler import Scheduler
+
+
+REQUEST = {"messages": [{"role": "user", "content": "hi"}]}
+
+
+class TrackedProvider(FakeProvider):
+    """FakeProvider that counts calls running right now and calls cancelled."""
+
+    def __init__(self, name, delays=(0.0,), **kwargs):
+        delays = iter(delays)
+        last = 0.0
+
+        def ttft():
+            nonlocal last
+            last = next(delays, last)
+            return last
+
+        super().__init__(ttft=ttft, **kwargs)
+        self.name = name
+        self.active = 0
+        self.cancelled = 0
+        register_provider(name, self)
+
+    async def acreate(self, **request):
+        self.active += 1
+        try:
+            return await super().acreate(**request)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.active -= 1
+
+
+def routes(*names):
+    return tuple((name, "model") for name in names)
+
+
+def text(completion):
+    return completion.choices[0].message.content
+
+
+def hedging_router(**kwargs):
+    return Router(hedge=True, quantile=0.5, min_samples=1, max_hedge_ratio=1.0, **kwargs)
+
+
+def test_falls_back_to_the_next_route_on_error():
+    TrackedProvider("broken", error_rate=1.0)
+    TrackedProvider("healthy", reply="fallback reply")
+    router = Router(hedge=False)
+
+    assert text(asyncio.run(router.acreate(routes("broken", "healthy"), **REQUEST))) == "fallback reply"
+    assert text(router.create(routes("broken", "healthy"), **REQUEST)) == "fallback reply"
+    assert router.stats()["fallbacks"] == 2
+
+
+def test_last_routes_error_is_raised():
+    TrackedProvider("down", error_rate=1.0)
+    router = Router(hedge=False)
+
+    with pytest.raises(FakeProviderError):
+        asyncio.run(router.acreate(routes("down", "down"), **REQUEST))
+
+
+def test_hedge_wins_and_the_slow_primary_is_cancelled():
+    # The first call sets a 10ms p50 for "stalls"; the second then stalls for 5s
+    stalls = TrackedProvider("stalls", delays=(0.01, 5.0), reply="primary")
+    TrackedProvider("quick", reply="backup")
+    router = hedging_router()
+
+    async def main():
+        assert text(await router.acreate(routes("stalls", "quick"), **REQUEST)) == "primary"
+        reply = await asyncio.wait_for(router.acreate(routes("stalls", "quick"), **REQUEST), 1.0)
+        await asyncio.sleep(0)
+        return text(reply)
+
+    assert asyncio.run(main()) == "backup"
+    assert router.stats()["hedges"] == 1
+    assert router.stats()["hedge_wins"] == 1
+    assert stalls.cancelled == 1 and stalls.active == 0
+
+
+def test_cancelled_caller_cancels_primary_and_hedge():
+    first = TrackedProvider("first", delays=(0.01, 5.0))
+    second = TrackedProvider("second", delays=(5.0,))
+    router = hedging_router()
+
+    async def main():
+        await router.acreate(routes("first", "second"), **REQUEST)
+        call = asyncio.create_task(router.acreate(routes("first", "second"), **REQUEST))
+        await asyncio.sleep(0.1)
+        assert first.active == 1 and second.active == 1
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        await asyncio.sleep(0)
+
+    asyncio.run(main())
+    assert first.active == 0 and second.active == 0
+    assert first.cancelled == 1 and second.cancelled == 1
+
+
+def test_hedge_is_admitted_through_the_scheduler(monkeypatch):
+    scheduler = Scheduler()
+    monkeypatch.setattr(agents2, "scheduler", scheduler)
+    monkeypatch.setattr(agents2, "router", hedging_router(admit=agents2._admit_hedge))
+    TrackedProvider("lagging", delays=(0.01, 5.0))
+    TrackedProvider("spare", reply="hedged")
+
+    async def main():
+        await agents2.generate_reply_async("sys", "warm up", use_cache=False, routes=routes("lagging", "spare"))
+        return await agents2.generate_reply_async("sys", "hedge me", use_cache=False, routes=routes("lagging", "spare"))
+
+    assert asyncio.run(main()) == "hedged"
+    # Two requests plus the hedged copy, each admitted once
+    assert scheduler.stats()["admitted"] == 3
+    assert scheduler.stats()["in_flight"] == 0
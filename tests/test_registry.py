@@ -0,0 +1,32 @@
+from registry import PersonaRegistry
+
+
+def test_resolves_exact_aliases_and_unambiguous_prefixes():
+    registry = PersonaRegistry(["CoderAI", "PoetAI", "PhilosopherAI", "ScientistAI"])
+    assert registry.resolve("coder") == "CoderAI"
+    assert registry.resolve("SCI") == "ScientistAI"
+    assert registry.resolve("p") is None
+    assert registry.match_command("poet write me a haiku") == ("PoetAI", "write me a haiku")
+    assert registry.match_command("po write me a haiku") is None
+
+
+def test_reregistering_replaces_old_aliases():
+    registry = PersonaRegistry(["CoderAI", "PoetAI"])
+    registry.register("CoderAI", aliases=["dev", "hacker"])
+    assert registry.resolve("hack") == "CoderAI"
+
+    registry.register("CoderAI", aliases=["dev"])
+    assert registry.get("hacker") is None
+    assert registry.resolve("hack") is None
+    assert registry.resolve("h") is None
+    assert registry.resolve("dev") == "CoderAI"
+    assert registry.resolve("coder") == "CoderAI"
+    assert registry.names == ["CoderAI", "PoetAI"]
+
+
+def test_alias_taken_over_by_another_persona_is_not_removed():
+    registry = PersonaRegistry(["CoderAI", "PoetAI"])
+    registry.register("CoderAI", aliases=["bard"])
+    registry.register("PoetAI", aliases=["bard"])
+    registry.register("CoderAI")
+    assert registry.resolve("bard") == "PoetAI"
@@ -0,0 +1,151 @@
+import asyncio
+import threading
+
+import pytest
+
+import agents2
+from providers import FakeProvider, FakeProviderError
+from scheduler import BACKGROUND, DIRECT, Scheduler, request_context
+
+
+def run_in_order(scheduler, calls):
+    """
+    Hold the only in-flight slot while `calls` ((priority, room, label), in
+    arrival order) queue up, then release it; returns labels in the order admitted.
+    """
+    provider = FakeProvider()
+    order = []
+    release = asyncio.Event()
+
+    async def blocker():
+        await release.wait()
+
+    async def call(label):
+        order.append(label)
+        return await provider.acreate(messages=[{"role": "user", "content": label}])
+
+    async def main():
+        holding = asyncio.create_task(scheduler.run(blocker))
+        await asyncio.sleep(0.01)
+        queued = []
+        for priority, room, label in calls:
+            with request_context(priority, room):
+                queued.append(asyncio.create_task(scheduler.run(lambda label=label: call(label))))
+            await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(holding, *queued)
+
+    asyncio.run(main())
+    return order
+
+
+def test_direct_calls_go_before_background_ones():
+    order = run_in_order(Scheduler(max_in_flight=1), [
+        (BACKGROUND, "debate", "turn 1"),
+        (BACKGROUND, "debate", "turn 2"),
+        (DIRECT, "chat", "reply"),
+    ])
+    assert order == ["reply", "turn 1", "turn 2"]
+
+
+def test_rooms_take_turns_within_a_priority():
+    order = run_in_order(Scheduler(max_in_flight=1), [
+        (DIRECT, "busy", "busy 1"),
+        (DIRECT, "busy", "busy 2"),
+        (DIRECT, "busy", "busy 3"),
+        (DIRECT, "quiet", "quiet 1"),
+        (DIRECT, "quiet", "quiet 2"),
+    ])
+    assert order == ["busy 1", "quiet 1", "busy 2", "quiet 2", "busy 3"]
+
+
+def test_retryable_errors_are_retried_up_to_the_cap():
+    scheduler = Scheduler(max_retries=2, retry_base=0.001, retry_max=0.002)
+    provider = FakeProvider(error_rate=1.0)
+
+    with pytest.raises(FakeProviderError):
+        asyncio.run(scheduler.run(lambda: provider.acreate(messages=[{"role": "user", "content": "hi"}])))
+    assert provider.calls == 3
+    assert scheduler.stats() == {"queued": 0, "in_flight": 0, "admitted": 3, "retries": 2, "failures": 1}
+
+
+def test_client_errors_are_not_retried():
+    scheduler = Scheduler(max_retries=3)
+    calls = 0
+
+    class BadRequest(Exception):
+        status_code = 400
+
+    async def call():
+        nonlocal calls
+        calls += 1
+        raise BadRequest()
+
+    with pytest.raises(BadRequest):
+        asyncio.run(scheduler.run(call))
+    assert calls == 1
+
+
+def test_backoff_is_capped():
+    scheduler = Scheduler(retry_base=0.5, retry_max=4)
+    error = FakeProviderError()
+    assert all(0 <= scheduler._backoff(attempt, error) <= 4 for attempt in range(20))
+
+    class Throttled(Exception):
+        status_code = 429
+        response = type("Response", (), {"headers": {"retry-after": "30"}})()
+
+    assert scheduler._backoff(0, Throttled()) == 4
+
+
+def test_blocking_calls_share_the_schedulers_limits(monkeypatch):
+    scheduler = Scheduler(max_in_flight=1)
+    monkeypatch.setattr(agents2, "scheduler", scheduler)
+    provider = FakeProvider(ttft=0.02, reply="done")
+    agents2.use_provider(provider)
+
+    active = peak = 0
+    acreate = provider.acreate
+
+    async def tracked(**request):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        try:
+            return await acreate(**request)
+        finally:
+            active -= 1
+
+    monkeypatch.setattr(provider, "acreate", tracked)
+
+    replies = []
+    threads = [
+        threading.Thread(target=lambda i=i: replies.append(agents2.generate_reply("sys", f"msg {i}", use_cache=False)))
+        for i in range(4)
+    ]
+    try:
+        for thread in threads:
+            thread.start()
+        streamed = "".join(agents2.generate_reply_stream("sys", "streamed", use_cache=False))
+        for thread in threads:
+            thread.join()
+    finally:
+        scheduler.close()
+
+    assert replies == ["done"] * 4
+    assert streamed == "done"
+    assert peak == 1
+    assert scheduler.stats()["admitted"] == 5
+    assert scheduler.stats()["in_flight"] == 0
+
+
+def test_blocking_call_on_the_loop_is_refused(monkeypatch):
+    monkeypatch.setattr(agents2, "scheduler", Scheduler())
+    agents2.use_provider(FakeProvider(reply="done"))
+
+    async def main():
+        assert await agents2.generate_reply_async("sys", "first", use_cache=False) == "done"
+        with pytest.raises(RuntimeError):
+            agents2.generate_reply("sys", "second", use_cache=False)
+
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_do_shares_one_call():
+    async def main():
+        flight = SingleFlight()
+        calls = 0
+
+        async def call():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "reply"
+
+        results = await asyncio.gather(*(flight.do("k", call) for _ in range(5)))
+        return results, calls, flight.stats()
+
+    results, calls, stats = asyncio.run(main())
+    assert results == ["reply"] * 5
+    assert calls == 1
+    assert stats == {"calls": 1, "shared": 4, "in_flight": 0}
+
+
+def test_do_keeps_running_while_any_caller_waits():
+    async def main():
+        flight = SingleFlight()
+
+        async def call():
+            await asyncio.sleep(0.02)
+            return "reply"
+
+        first = asyncio.create_task(flight.do("k", call))
+        second = asyncio.create_task(flight.do("k", call))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "reply"
+
+
+def test_do_retry_after_last_caller_left_gets_a_fresh_call():
+    async def main():
+        flight = SingleFlight()
+        calls = 0
+
+        async def call():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return f"reply {calls}"
+
+        abandoned = asyncio.create_task(flight.do("k", call))
+        await asyncio.sleep(0)
+        abandoned.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await abandoned
+        # The abandoned call's cancellation has not landed yet
+        return await flight.do("k", call), calls
+
+    assert asyncio.run(main()) == ("reply 2", 2)
+
+
+def test_stream_retry_after_last_reader_left_gets_a_fresh_stream():
+    async def main():
+        flight = SingleFlight()
+        streams = 0
+
+        async def source():
+            nonlocal streams
+            streams += 1
+            for part in ("a", "b", "c"):
+                await asyncio.sleep(0.005)
+                yield part
+
+        reader = flight.stream("k", source)
+        assert await reader.__anext__() == "a"
+        await reader.aclose()
+        return [part async for part in flight.stream("k", source)], streams
+
+    assert asyncio.run(main()) == (["a", "b", "c"], 2)
@@ -0,0 +1,325 @@
+# ============================================================
+# transcripts.py — stream a chatroom's full transcript out of the DB
+#
+# Rows are read oldest first through a server-side cursor (yield_per),
+# so a debate of any length is exported in constant memory, as:
+#
+#   NDJSON   one {"id", "role", "author", "content", "created_at"} per line
+#   binary   gzip stream of columnar blocks (read back with read_binary)
+#
+# Binary layout, inside the gzip stream:
+#   b"AGTX" + version byte + varint-prefixed chatroom id
+#   then blocks of up to BLOCK_SIZE records, each:
+#     varint n
+#     n zigzag varints   id delta
+#     n zigzag varints   created_at delta (microseconds since epoch)
+#     n varints          role string index
+#     n varints          author string index
+#     n varints          content byte length, then the n contents
+#   A string index equal to the table size introduces a new string:
+#   varint length + UTF-8 bytes follow it inline. Deltas and the string
+#   table carry over between blocks.
+# ============================================================
+
+import asyncio
+import json
+import os
+import zlib
+from itertools import islice
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import ChatroomLog
+
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))  # rows per cursor fetch
+BLOCK_SIZE = 256
+REPLAY_MAX_GAP = float(os.getenv("REPLAY_MAX_GAP", "5"))  # longest pause kept when replaying (s)
+
+MAGIC = b"AGTX"
+VERSION = 1
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+# ============================================================
+# READING
+# ============================================================
+
+def iter_transcript(db: Session, chatroom_id: str, batch_size: int = EXPORT_BATCH_SIZE):
+    """Yield a room's messages oldest first, `batch_size` rows in memory at a time."""
+    query = (
+        select(ChatroomLog.id, ChatroomLog.role, ChatroomLog.ai_name, ChatroomLog.message, ChatroomLog.created_at)
+        .where(ChatroomLog.chatroom_id == chatroom_id)
+        .order_by(ChatroomLog.created_at, ChatroomLog.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for row_id, role, ai_name, message, created_at in db.execute(query):
+        yield {
+            "id": row_id,
+            "role": role,
+            "author": ai_name if role == "ai" else "User",
+            "content": message or "",
+            "created_at": created_at,
+        }
+
+
+# ============================================================
+# NDJSON
+# ============================================================
+
+def ndjson_line(record) -> bytes:
+    return (json.dumps({**record, "created_at": record["created_at"].isoformat()}) + "\n").encode()
+
+
+def to_ndjson(records, block_size: int = BLOCK_SIZE):
+    """NDJSON lines, joined `block_size` records per chunk to keep writes (and thread hops) few."""
+    lines = []
+    for record in records:
+        lines.append(ndjson_line(record))
+        if len(lines) == block_size:
+            yield b"".join(lines)
+            lines = []
+    if lines:
+        yield b"".join(lines)
+
+
+def read_ndjson(lines):
+    for line in lines:
+        if line.strip():
+            record = json.loads(line)
+            record["created_at"] = datetime.fromisoformat(record["created_at"])
+            yield record
+
+
+# ============================================================
+# BINARY
+# ============================================================
+
+def _varint(value: int, out: bytearray):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _zigzag(value: int) -> int:
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _unzigzag(value: int) -> int:
+    return value >> 1 if not value & 1 else -(value >> 1) - 1
+
+
+def _micros(created_at: datetime) -> int:
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return (created_at - _EPOCH) // timedelta(microseconds=1)
+
+
+class _Encoder:
+    def __init__(self):
+        self.strings = {}
+        self.last_id = 0
+        self.last_micros = 0
+
+    def _string(self, value, out):
+        index = self.strings.get(value)
+        if index is not None:
+            _varint(index, out)
+            return
+        index = self.strings[value] = len(self.strings)
+        data = value.encode()
+        _varint(index, out)
+        _varint(len(data), out)
+        out += data
+
+    def block(self, records) -> bytes:
+        out = bytearray()
+        _varint(len(records), out)
+        for record in records:
+            _varint(_zigzag(record["id"] - self.last_id), out)
+            self.last_id = record["id"]
+        for record in records:
+            micros = _micros(record["created_at"])
+            _varint(_zigzag(micros - self.last_micros), out)
+            self.last_micros = micros
+        for record in records:
+            self._string(record["role"] or "", out)
+        for record in records:
+            self._string(record["author"] or "", out)
+        contents = [record["content"].encode() for record in records]
+        for data in contents:
+            _varint(len(data), out)
+        for data in contents:
+            out += data
+        return bytes(out)
+
+
+def to_binary(records, chatroom_id: str, block_size: int = BLOCK_SIZE):
+    """Encode `records` as gzip-compressed columnar blocks, yielding compressed chunks."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    encoder = _Encoder()
+
+    header = bytearray(MAGIC)
+    header.append(VERSION)
+    room = chatroom_id.encode()
+    _varint(len(room), header)
+    header += room
+    pending = compressor.compress(bytes(header))
+
+    block = []
+    for record in records:
+        block.append(record)
+        if len(block) == block_size:
+            pending += compressor.compress(encoder.block(block))
+            block = []
+            if pending:
+                yield pending
+                pending = b""
+    if block:
+        pending += compressor.compress(encoder.block(block))
+    yield pending + compressor.flush()
+
+
+class _Reader:
+    """Pulls bytes from decompressed chunks on demand."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.buffer = b""
+        self.pos = 0
+
+    def _fill(self, n) -> bool:
+        while len(self.buffer) - self.pos < n:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                return False
+            self.buffer = self.buffer[self.pos:] + chunk
+            self.pos = 0
+        return True
+
+    def at_end(self) -> bool:
+        return not self._fill(1)
+
+    def read(self, n) -> bytes:
+        if not self._fill(n):
+            raise ValueError("truncated transcript")
+        data = self.buffer[self.pos:self.pos + n]
+        self.pos += n
+        return data
+
+    def varint(self) -> int:
+        value = shift = 0
+        while True:
+            byte = self.read(1)[0]
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+
+def _decompressed(chunks):
+    decompressor = zlib.decompressobj(31)
+    for chunk in chunks:
+        data = decompressor.decompress(chunk)
+        if data:
+            yield data
+    data = decompressor.flush()
+    if data:
+        yield data
+
+
+def read_binary(chunks):
+    """Decode a to_binary stream (any chunking) back into records, one block in memory at a time."""
+    reader = _Reader(_decompressed(iter(chunks)))
+    if reader.read(len(MAGIC)) != MAGIC:
+        raise ValueError("not a transcript export")
+    if reader.read(1)[0] != VERSION:
+        raise ValueError("unsupported transcript version")
+    reader.read(reader.varint())  # chatroom id
+
+    strings = []
+    last_id = last_micros = 0
+
+    def string():
+        index = reader.varint()
+        if index == len(strings):
+            strings.append(reader.read(reader.varint()).decode())
+        return strings[index]
+
+    while not reader.at_end():
+        n = reader.varint()
+        ids, stamps = [], []
+        for _ in range(n):
+            last_id += _unzigzag(reader.varint())
+            ids.append(last_id)
+        for _ in range(n):
+            last_micros += _unzigzag(reader.varint())
+            stamps.append(last_micros)
+        roles = [string() for _ in range(n)]
+        authors = [string() for _ in range(n)]
+        lengths = [reader.varint() for _ in range(n)]
+        for i in range(n):
+            yield {
+                "id": ids[i],
+                "role": roles[i],
+                "author": authors[i],
+                "content": reader.read(lengths[i]).decode(),
+                "created_at": _EPOCH + timedelta(microseconds=stamps[i]),
+            }
+
+
+# ============================================================
+# REPLAY
+# ============================================================
+
+_closing = set()  # keeps close tasks alive until they finish
+
+
+async def _close_after(fetch, close):
+    if fetch is not None:
+        await asyncio.wait({fetch})
+        if not fetch.cancelled():
+            fetch.exception()  # retrieved; the caller is gone
+    await asyncio.to_thread(close)
+
+
+async def in_thread(records, batch_size: int = EXPORT_BATCH_SIZE):
+    """Drain a blocking record iterator (e.g. iter_transcript) from a worker thread, a batch per hop."""
+    fetch = None
+    try:
+        while True:
+            fetch = asyncio.ensure_future(asyncio.to_thread(list, islice(records, batch_size)))
+            batch = await asyncio.shield(fetch)
+            if not batch:
+                break
+            for record in batch:
+                yield record
+    finally:
+        close = getattr(records, "close", None)
+        if close is not None:
+            # A cancelled caller can leave the last fetch running in its thread, and
+            # a running generator cannot be closed: close it (and its DB session) once
+            # that fetch returns, without blocking the loop
+            cleanup = asyncio.ensure_future(_close_after(fetch, close))
+            _closing.add(cleanup)
+            cleanup.add_done_callback(_closing.discard)
+            await asyncio.shield(cleanup)
+
+
+async def paced(records, speed: float = 1.0, max_gap: float = REPLAY_MAX_GAP):
+    """
+    Re-emit an async stream of records with their recorded gaps divided by
+    `speed` (0 = no waiting), each gap capped at `max_gap` seconds.
+    """
+    previous = None
+    async for record in records:
+        if previous is not None and speed > 0:
+            gap = (record["created_at"] - previous).total_seconds() / speed
+            if gap > 0:
+                await asyncio.sleep(min(gap, max_gap))
+        previous = record["created_at"]
+        yield record